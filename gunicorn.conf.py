@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+# gunicorn configuration (preload-and-fork).
+#
+#     gunicorn --config gunicorn.conf.py
+#
+# The master imports src/app.py once (data, caches, deferred libraries),
+# freezes the garbage collector and forks the workers: they start with the
+# loaded data and share its memory pages copy-on-write instead of each one
+# loading its own copy. Set GUNICORN_PRELOAD=0 to load the app in every
+# worker instead (src/worker_memory.py compares both).
+
+import gc
+import os
+
+
+chdir = "src"
+wsgi_app = "app:server"
+
+# Workers x threads: the callbacks are numpy / statsmodels bound, the
+# threads mostly cover SQLite and slow clients
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+timeout = 120
+
+# Recycle workers now and then; a new worker is forked from the loaded master
+max_requests = 1000
+max_requests_jitter = 100
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+
+    import app
+
+    # Everything the workers would load lazily is loaded once here, then the
+    # objects are moved to the permanent generation so that collections in
+    # the workers never write to (and copy) the shared pages
+    app.warm_up()
+    gc.collect()
+    gc.freeze()
+    server.log.info("Preloaded app, %d objects frozen", gc.get_freeze_count())
+
+
+# Threads do not survive the fork: every worker starts its own background tasks
+# (without preload this is where the worker first imports the app)
+def post_fork(server, worker):
+    import app
+
+    app.start_background_tasks()
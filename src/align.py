@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+# Date-keyed alignment of sparse daily series onto a target date index.
+#
+# Joins on calendar days (never on row position) with np.searchsorted, one
+# pass per source column, so aligning more influencers or years scales
+# linearly. Every value is computed from the source observations around
+# its own target date, so aligning a tail of new dates gives the same
+# values as re-aligning everything.
+#
+# Fill policies for target dates without an observation on that day:
+#
+#     "none"         leave NaN (exact calendar-day join)
+#     "zero"         0
+#     "ffill"        last observation before the date (merge-as-of backward)
+#     "interpolate"  linear in time between the surrounding observations
+#
+# `tolerance` (days) bounds how far "ffill" looks back and how wide a gap
+# "interpolate" bridges; `lag` (days) pairs target date t with the source
+# at t - lag.
+
+import numpy as np
+import pandas as pd
+
+
+FILL_POLICIES = ("none", "zero", "ffill", "interpolate")
+
+
+# Sorted calendar days with binary-search lookups
+class DateIndex:
+
+    def __init__(self, dates):
+        self.dates = np.asarray(pd.DatetimeIndex(dates).normalize(), dtype="datetime64[D]")
+
+    def __len__(self):
+        return len(self.dates)
+
+    # Position of the last date <= each query (-1 if none)
+    def before(self, dates):
+        return np.searchsorted(self.dates, dates, "right") - 1
+
+    # Position of the first date >= each query (len if none)
+    def after(self, dates):
+        return np.searchsorted(self.dates, dates, "left")
+
+    def to_index(self, name="Date"):
+        return pd.DatetimeIndex(self.dates.astype("datetime64[ns]"), name=name)
+
+
+# Values of one source column (observations `days`, `values`) on the query days
+def _align_column(days, values, query, fill, tolerance):
+    out = np.full(len(query), np.nan)
+    if not len(days):
+        return out if fill != "zero" else np.zeros(len(query))
+
+    prev = np.searchsorted(days, query, "right") - 1
+    has_prev = prev >= 0
+    prev_day = days[np.maximum(prev, 0)]
+    exact = has_prev & (prev_day == query)
+
+    if fill in ("none", "zero"):
+        out[exact] = values[prev[exact]]
+        if fill == "zero":
+            out[~exact] = 0.0
+
+    elif fill == "ffill":
+        hit = has_prev
+        if tolerance is not None:
+            hit &= (query - prev_day) <= tolerance
+        out[hit] = values[prev[hit]]
+
+    elif fill == "interpolate":
+        nxt = np.searchsorted(days, query, "left")
+        inside = has_prev & (nxt < len(days))
+        nxt_day = days[np.minimum(nxt, len(days) - 1)]
+        if tolerance is not None:
+            inside &= (nxt_day - prev_day) <= tolerance
+        gap = np.where(exact, 1, nxt_day - prev_day)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = np.where(exact, 0.0, (query - prev_day) / gap)
+        p, n = prev[inside], np.minimum(nxt, len(days) - 1)[inside]
+        out[inside] = values[p] + weight[inside] * (values[n] - values[p])
+        out[exact] = values[prev[exact]]
+
+    else:
+        raise ValueError("Unknown fill policy %r, expected one of %s" % (fill, ", ".join(FILL_POLICIES)))
+
+    return out
+
+
+# Align a Series / DF indexed by dates onto `target` (DateIndex or dates)
+def align(source, target, fill="none", lag=0, tolerance=None):
+    if not isinstance(target, DateIndex):
+        target = DateIndex(target)
+    frame = source.to_frame() if isinstance(source, pd.Series) else source
+    if not frame.index.is_monotonic_increasing:
+        frame = frame.sort_index()
+
+    source_days = DateIndex(frame.index).dates.astype(np.int64)
+    query = target.dates.astype(np.int64) - int(lag)
+
+    out = np.empty((len(target), frame.shape[1]))
+    for j in range(frame.shape[1]):
+        values = frame.iloc[:, j].to_numpy(dtype=np.float64)
+        ok = ~np.isnan(values)
+        out[:, j] = _align_column(source_days[ok], values[ok], query, fill, tolerance)
+
+    aligned = pd.DataFrame(out, index=target.to_index(), columns=frame.columns)
+    return aligned.iloc[:, 0].rename(source.name) if isinstance(source, pd.Series) else aligned
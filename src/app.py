@@ -1,59 +1,60 @@
 # -*- coding: utf-8 -*-
 
 # Main Libaries
+import functools
+import os
+import threading
 import numpy as np
 import pandas as pd
 
 # Datetime Library
-from datetime import datetime, timedelta
+from datetime import datetime
 from datetime import date
 
-# Yahoo Finance API
-import yfinance as yf
+# Deferred Imports (loaded by the first callback using them, see lazy.py)
+import lazy
+from lazy import lazy_import
 
 # Data Visualisation
 import plotly.express as px
 import plotly.graph_objs as go
-import plotly.figure_factory as ff
 from plotly.subplots import make_subplots
-import plotly.tools as tls
-
-from wordcloud import WordCloud    
-
-# Data preprocessing
-from sklearn.preprocessing import StandardScaler
-from sklearn.preprocessing import MinMaxScaler
+ff = lazy_import("plotly.figure_factory")
 
 # Web App
 import dash
 from dash import dcc
 from dash import html
+from dash import dash_table
 import dash_daq as daq
-from dash import Dash, dash_table
-from dash.dependencies import Input, Output, State
-from dash.dash_table.Format import Group
+from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
 from dash_bootstrap_components._components.Container import Container
 
 
 
 # Stats Library
-from scipy import stats
-
-from statsmodels.tools.sm_exceptions import (
-    CollinearityWarning,
-    InfeasibleTestError,
-    InterpolationWarning,
-    MissingDataError,
-)
-from statsmodels.graphics.gofplots import qqplot
-from statsmodels.graphics.tsaplots import plot_acf, plot_pacf
-from statsmodels.tsa.stattools import pacf, acf
-from statsmodels.tsa.stattools import adfuller
-from statsmodels.stats.diagnostic import acorr_ljungbox
-from statsmodels.tsa.seasonal import seasonal_decompose
-from statsmodels.tsa.stattools import grangercausalitytests
-from statsmodels.tsa.stattools import coint
+stattools = lazy_import("statsmodels.tsa.stattools")
+
+# Precomputed Structures
+from summary_cube import SummaryCube
+from granger import granger_min_pvalues
+from result_store import ResultStore, data_hash, window_key
+from panel import Panel
+from derived import DerivedSeries
+import data_cache
+from ingest import Ingestor, DropFileSource
+from memo import CallbackCache, source_version
+from jobs import JobQueue
+import sentiment
+import rolling
+import autocorrelation
+import downsample
+import decomposition
+import stationarity
+import volatility
+import wordclouds
+import images
 
 
 BS = "https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css"
@@ -67,6 +68,9 @@ server = app.server
 
 app.config.suppress_callback_exceptions = True
 
+# Raster figures: "url" serves cached PNGs from a static route (ETag), "inline" embeds them as data URIs
+IMAGE_TRANSPORT = "url"
+
 
 ######################################################################################################################
 
@@ -96,32 +100,284 @@ CONTENT_STYLE = {
 
 ##################################################### Load & Transform ###############################################
 
+# Cleaned components & tweets, memory-mapped from the binary cache (rebuilt from the CSVs when they change)
+components, tweets_df = data_cache.load("btc_components.csv", "tweets_sentiment.csv")
+
+# Wide Panel (dates x variables array) for date-window slicing
+panel = Panel(*components)
+
+# Derived Panels of every component (% / log changes, z-scores, min-max scaling), read as views by the callbacks
+derived = DerivedSeries(panel)
+
 # Pivot DF
-df = pd.read_csv("btc_components.csv")
-df = df.interpolate()
-df = df.dropna()
-df = df.drop(columns=["Volume.1", "Returns.1", "Returns"])
-# Percent Change + Drop null values
-df['returns'] = 100 * df.Close.pct_change().dropna()
+df = data_cache.components_frame(panel.dates, panel.values, panel.variables)
+
+# Summary Statistics Cube (variable x year x month) for the indicators
+summary_cube = SummaryCube.from_frame(df)
+
+# Daily Sentiment Panel (returns + mean sentiment per influencer, aligned by date)
+# Exact calendar-day join, no lag: only the days an influencer tweeted are paired with returns
+SENTIMENT_ALIGNMENT = dict(fill="none", lag=0, tolerance=None)
+
+daily_sentiment_df = sentiment.daily_sentiment(tweets_df)
+scaled_sentiment_df = sentiment.minmax_daily_sentiment(tweets_df, daily_sentiment_df)
+tweets_panel = sentiment.sentiment_panel(daily_sentiment_df, panel.series("returns"), **SENTIMENT_ALIGNMENT)
+
+# Word Cloud term frequencies per (influencer, year) + rendered images cached on disk
+# (tokenised on first use, so that wordcloud / matplotlib are not imported at boot)
+@functools.lru_cache(maxsize=None)
+def tweets_term_frequencies():
+    return wordclouds.term_frequencies(tweets_df)
+
+wordcloud_images = wordclouds.ImageCache("wordclouds")
+WORDCLOUD_ROUTE = images.register_route(server, "/images/wordcloud", wordcloud_images)
+
+
+# Incremental ingestion: new daily rows dropped next to btc_components.csv are cleaned
+# on their own and appended to every structure above
+INGEST_FILE = "btc_components_new.csv"
+INGEST_INTERVAL = 60 * 60 # seconds
+
+ingestor = Ingestor(df.iloc[-1], data_hash(df))
+
+@ingestor.subscribe
+def append_components(tail, version):
+    global df
+
+    dates = pd.to_datetime(tail["Date"])
+    values = tail[panel.variables].to_numpy(dtype=np.float64)
+
+    panel.append(dates, values)
+    derived.append(dates, values)
+    summary_cube.append(dates, values)
+    df = pd.concat([df, tail], ignore_index=True)
+    tweets_panel.append(*sentiment.sentiment_rows(daily_sentiment_df, pd.Series(tail["returns"].values, index=dates),
+                                                  **SENTIMENT_ALIGNMENT))
+
+# Result Store (Granger / cointegration p-values per date window), keyed by the data version;
+# opened on the CSV's version so that the catch-up below carries the precomputed windows over
+results = ResultStore("results.sqlite", ingestor.version)
+
+@ingestor.subscribe
+def rebase_results(tail, version):
+    results.rebase(version, tail["Date"].iloc[0])
+
+# Catch up with the drop file
+ingest_source = DropFileSource(INGEST_FILE)
+ingestor.ingest(ingest_source)
+
+
+
+# Background Jobs (long statistical tests, e.g. the Granger causality table), queued in a
+# SQLite file shared by the workers and deduplicated per (window, data version); a runner
+# only takes the jobs submitted on the data version of its worker
+job_queue = JobQueue("jobs.sqlite", lambda: ingestor.version)
+
+# Job runner threads per worker (0: run them in a separate process with `python jobs.py`)
+JOB_RUNNERS = int(os.environ.get("JOB_RUNNERS", 1))
+
+
+# Background Tasks, started only by the processes serving the app: every gunicorn worker in
+# post_fork (threads do not survive a fork) or `python app.py`; importing the app starts none
+def start_background_tasks(job_runners=JOB_RUNNERS):
+    ingestor.start_polling(ingest_source, INGEST_INTERVAL)
+    for _ in range(job_runners):
+        job_queue.start_runner()
+    threading.Thread(target=precompute_decompositions, name="decompositions", daemon=True).start()
+
+
+# Load what the callbacks would load on first use (deferred libraries, word cloud term frequencies, ACF / PACF,
+# stationarity tests, seasonal decompositions),
+# e.g. once in the gunicorn master before the workers are forked
+def warm_up():
+    lazy.load_all()
+    tweets_term_frequencies()
+    autocorrelations()
+    stationarity_pvalues()
+    precompute_decompositions()
+
+
+# Callback Cache: in-process LRU + SQLite file shared by the gunicorn workers, keyed by the data version
+# of the components, the hash of the tweets CSV the worker loaded (the tweets are not ingested) and
+# the hash of the deployed sources (a redeploy never reads the figures of the previous code)
+tweets_version = data_cache.source_hash("tweets_sentiment.csv")
+
+callback_cache = CallbackCache("callback_cache.sqlite", lambda: ingestor.version + tweets_version,
+                               code_version=source_version(os.path.dirname(os.path.abspath(__file__))),
+                               max_items=256, max_bytes=256 * 2**20, ttl=24 * 3600)
+
+# Hit / miss counters of the worker answering the request
+@server.route("/cache-stats")
+def cache_stats():
+    return dict(callback_cache.stats(), pid=os.getpid())
+
+
+################################################## Statistical Tests ################################################
+
+# Granger Causality of Close on every column of the window, or only on `variables` (min p-value
+# over lags 1..maxlag); progress(done, total) is called after every pair when given
+def close_causality_pvalues(start_date, end_date, maxlag=4, progress=None, variables=None):
+    start, end = window_key(start_date, end_date)
+    variables = panel.variables if variables is None else list(variables)
+
+    pvalues = results.get_many("granger", variables, start, end, maxlag)
+    if len(pvalues) < len(variables):
+        rows, close = panel.bounds(start, end), panel.column("Close", start, end)
+        missing = [variable for variable in variables if variable not in pvalues]
+
+        # One pair at a time when the progress is followed, else all of them in one batch
+        for batch in ([[variable] for variable in missing] if progress else [missing]):
+            columns = [panel.index[variable] for variable in batch]
+            pvalues.update(zip(batch, granger_min_pvalues(panel.values[rows][:, columns], close, maxlag=maxlag)))
+            if progress:
+                progress(len(pvalues), len(variables))
+
+        results.put_many("granger", pvalues, start, end, maxlag)
+
+    return pd.Series(pvalues)[variables]
+
+
+# Granger causality table of a window, as a background job
+@job_queue.task("granger_table")
+def granger_table_job(params, progress):
+    progress(0, len(panel.variables))
+    pvalues = close_causality_pvalues(params["start"], params["end"], params["maxlag"], progress=progress)
+    return {variable: (None if np.isnan(p) else float(p)) for variable, p in pvalues.items()}
+
+
+# Cointegration p-value of Close and the selected variable (maxlag 0: automatic lag selection)
+def cointegration_pvalue(selected_variable, start_date, end_date):
+    start, end = window_key(start_date, end_date)
+
+    pvalue = results.get("coint", selected_variable, start, end, 0)
+    if pvalue is None:
+        data = panel.frame(start, end, sorted({"Close", selected_variable}))
+        score,pvalue,_=stattools.coint(data.iloc[:, 0],data.iloc[:, 1])
+        results.put("coint", selected_variable, pvalue, start, end, 0)
+
+    return pvalue
+
+
+# ACF / PACF of the daily % changes of every component over its last ACF_DAYS days,
+# computed in one batch per data version (see autocorrelation.py)
+ACF_DAYS = 1825
+
+@callback_cache.memoize
+def autocorrelations():
+    changes = derived.frame("pct_change").iloc[1:]
+
+    # Complete columns share one batch; a column with gaps is handled on its own days
+    gaps = changes.columns[changes.isna().any()]
+    groups = [[variable] for variable in gaps] + [[variable for variable in changes.columns if variable not in gaps]]
+
+    table = {}
+    for variables in groups:
+        values = changes[variables].dropna().to_numpy()[-ACF_DAYS:]
+        if not variables or len(values) < 4:
+            continue
+        acf, acf_interval = autocorrelation.acf(values, autocorrelation.default_nlags(len(values)))
+        pacf, pacf_interval = autocorrelation.pacf(values, autocorrelation.default_nlags(len(values), partial=True))
+        for j, variable in enumerate(variables):
+            table[variable] = (pacf[:, j], pacf_interval[:, j], acf[:, j], acf_interval[:, j])
+    return table
+
+
+# x or y of a single line trace drawing a segment from `starts[i]` to `ends[i]` for every i
+# (None breaks the line between segments)
+def stem_segments(starts, ends):
+    return [value for start, end in zip(starts.tolist(), ends.tolist()) for value in (start, end, None)]
+
+
+# Seasonal decompositions of the daily % changes of every component, per mode (see decomposition.py).
+# Computed for all components at once: in the background at startup and after an ingestion, or by
+# the first callback asking; a lock per mode keeps concurrent callers from computing a mode twice
+# without making a classical request wait for the STL batch
+decomposition_locks = {mode: threading.Lock() for mode in decomposition.MODES}
+
+@callback_cache.memoize
+def all_decompositions(mode):
+    return decomposition.decompose_all(derived.frame("pct_change"), mode)
+
+def decompositions(mode):
+    with decomposition_locks[mode]:
+        return all_decompositions(mode)
+
+def precompute_decompositions():
+    for mode in decomposition.MODES:
+        decompositions(mode)
+
+# Once the new version is published, so that they are cached under it
+@ingestor.on_publish
+def refresh_decompositions(version):
+    threading.Thread(target=precompute_decompositions, name="decompositions", daemon=True).start()
 
-# Apply log returns
-df['log_returns'] = np.log(df.Close/df.Close.shift(1))
 
-# Drop NA
-df = df.dropna()
+# ADF / KPSS p-values of every component at levels and in first differences (variables x
+# stationarity.TESTS), kept in the result store for the data version; missing ones are tested in one batch
+def test_stationarity(n_jobs=None):
+    start, end = window_key(panel.dates[0], panel.dates[-1])
+    stored = {test: results.get_many(test, panel.variables, start, end, 0) for test in stationarity.TESTS}
 
-# Melted DF
-df_melted = df.melt(id_vars=['Date'])
-df_melted["Date"] = pd.to_datetime(df_melted["Date"])
-df_melted["month"] = df_melted["Date"].dt.month
-df_melted["year"] = df_melted["Date"].dt.year
+    missing = [v for v in panel.variables if any(v not in stored[test] for test in stationarity.TESTS)]
+    if missing:
+        computed = stationarity.test_all(panel.frame(variables=missing).to_numpy(), missing, n_jobs=n_jobs)
+        for test in stationarity.TESTS:
+            results.put_many(test, computed[test], start, end, 0)
+            stored[test].update(computed[test])
 
+    return pd.DataFrame(stored, index=panel.variables, columns=list(stationarity.TESTS))
 
-# Tweetsdis
-tweets_df = pd.read_csv("tweets_sentiment.csv")
-tweets_df["Datetime"] = pd.to_datetime(tweets_df["Datetime"])
-tweets_df["month"] = tweets_df["Datetime"].dt.month
-tweets_df["year"] = tweets_df["Datetime"].dt.year
+@callback_cache.memoize
+def stationarity_pvalues():
+    return test_stationarity()
+
+
+# Rolling windows (days) of the rolling correlation / cointegration chart; the cointegration
+# p-value is evaluated every ROLLING_COINT_STEP days
+ROLLING_WINDOWS = [30, 60, 90, 180, 365]
+ROLLING_COINT_STEP = 7
+
+# Rolling correlation & cointegration p-value of Close and the selected variable, cached per (variable, window)
+@callback_cache.memoize
+def rolling_statistics(selected_variable, window):
+    dates = panel.date_index()
+    correlation = pd.Series(rolling.rolling_correlation(panel.column("Close"), panel.column(selected_variable), window),
+                            index=dates)
+
+    # Same column order as the cointegration indicator
+    first, second = sorted(["Close", selected_variable])
+    ends, pvalues = rolling.rolling_cointegration(panel.values, panel.index[first], panel.index[second],
+                                                  window, step=ROLLING_COINT_STEP)
+    return correlation, pd.Series(pvalues, index=dates[ends])
+
+
+# Volatility models are fitted on the last VOLATILITY_WINDOWS days (0: every day) and
+# forecast VOLATILITY_HORIZON days ahead
+VOLATILITY_WINDOWS = [365, 730, 0]
+VOLATILITY_HORIZON = 30
+
+# Percentage returns, fitted & forecast conditional volatility of the selected variable; the fitted
+# parameters are kept in the result store per (variable, model, window) and warm-start the next fit
+@callback_cache.memoize
+def volatility_model(selected_variable, model, window):
+    returns = volatility.percentage_returns(panel.series(selected_variable),
+                                            derived.series("pct_change", selected_variable))
+    if window:
+        returns = returns.iloc[-window:]
+
+    params = volatility.fitted_params(results, selected_variable, model, returns)
+    fitted, forecast = volatility.conditional_volatility(returns, model, params, VOLATILITY_HORIZON)
+    return returns, fitted, forecast
+
+
+# Fewest common days the sentiment tests run on (Granger with 4 lags needs more than 3 * 4 + 1)
+MIN_SENTIMENT_DAYS = 3 * 4 + 2
+
+# Returns / daily sentiment of the influencer over the year, on the days with tweets
+def sentiment_pair(selected_influencer, selected_year):
+    pair = tweets_panel.frame("%d-01-01" % selected_year, "%d-12-31" % selected_year,
+                              ["returns", selected_influencer])
+    return pair.rename(columns={selected_influencer: "sentiment"}).dropna()
 
 
 ###################################################### Content ######################################################
@@ -299,7 +555,7 @@ def render_page_content(pathname):
                             id='btc-components-dropdown',
                             placeholder="Select  BTC Feature",
                      options=[{'label': i, 'value': i}
-                              for i in df_melted['variable'].unique()],
+                              for i in panel.variables],
                             style=dict(
                                 width='100%',
                                 verticalAlign="center",
@@ -485,7 +741,7 @@ def render_page_content(pathname):
                             id='btc-components-dropdown',
                             placeholder="Select  BTC Feature",
                      options=[{'label': i, 'value': i}
-                              for i in df_melted['variable'].unique()],
+                              for i in panel.variables],
                             style=dict(
                                 width='100%',
                                 verticalAlign="center",
@@ -549,6 +805,29 @@ def render_page_content(pathname):
 
                 ], width=3),
             ], align='center'), 
+
+            html.Br(),
+
+            # Rolling Correlation & Cointegration
+            dbc.Row([
+                dbc.Col([
+                html.H4("Rolling Correlation & Cointegration p-value", className="card-title",
+                        style={"fontFamily": "courier", "textAlign":"center"}),
+                    dbc.Card(
+                        dbc.CardBody([
+                            dcc.Dropdown(
+                                id='rolling-window-dropdown',
+                                options=[{'label': '%d days' % w, 'value': w} for w in ROLLING_WINDOWS],
+                                value=90,
+                                clearable=False,
+                                style=dict(width='12rem', border="1px solid black", backgroundColor="#f0f8ff",
+                                           fontFamily='Courier')),
+                            html.Div([
+                                dcc.Graph(id="rolling_plot")
+                            ])
+                        ]),style={"border": "1px solid black"}),
+                ], width=12),
+            ], align='center'),
             
             
             # Breakline
@@ -595,7 +874,10 @@ def render_page_content(pathname):
                     dbc.Card(
                         dbc.CardBody([
                             html.Div([
-                                dcc.Graph(id='causality_table')  
+                                dcc.Graph(id='causality_table'),
+                                dbc.Progress(id='causality-job-progress', value=0, label="",
+                                             striped=True, animated=True, style={"display": "none"}),
+                                dcc.Interval(id='causality-job-poll', interval=1000, disabled=True)
                             ])
                             
                         ]),style={"border": "1px solid black"}),
@@ -649,7 +931,7 @@ def render_page_content(pathname):
                             id='btc-components-dropdown',
                             placeholder="Select  BTC Feature",
                      options=[{'label': i, 'value': i}
-                              for i in df_melted['variable'].unique()],
+                              for i in panel.variables],
                             style=dict(
                                 width='100%',
                                 verticalAlign="center",
@@ -682,6 +964,43 @@ def render_page_content(pathname):
                 
                 
             ], align='center'), 
+
+            html.Br(),
+
+            # Conditional Volatility (GARCH family)
+            dbc.Row([
+                dbc.Col([
+                html.H4("Conditional Volatility", className="card-title", style={"fontFamily": "courier",
+                                                                      "textAlign":"center"}),
+                    dbc.Card(
+                        dbc.CardBody([
+                            dbc.Row([
+                                dbc.Col([
+                                    dcc.Dropdown(
+                                        id='volatility-model-dropdown',
+                                        options=[{'label': m, 'value': m} for m in volatility.MODELS],
+                                        value='GARCH',
+                                        clearable=False,
+                                        style=dict(border="1px solid black", backgroundColor="#f0f8ff",
+                                                   fontFamily='Courier')),
+                                ], width=3),
+                                dbc.Col([
+                                    dcc.Dropdown(
+                                        id='volatility-window-dropdown',
+                                        options=[{'label': '%d days' % w if w else 'All days', 'value': w}
+                                                 for w in VOLATILITY_WINDOWS],
+                                        value=730,
+                                        clearable=False,
+                                        style=dict(border="1px solid black", backgroundColor="#f0f8ff",
+                                                   fontFamily='Courier')),
+                                ], width=3),
+                            ]),
+                            html.Div([
+                                dcc.Graph(id="conditional_volatility_plot")
+                            ])
+                        ]),style={"border": "1px solid black"}),
+                ], width=12),
+            ], align='center'),
             
             html.Br(),
             
@@ -704,6 +1023,13 @@ def render_page_content(pathname):
                                                                       "textAlign":"center"}),            
                     dbc.Card(
                         dbc.CardBody([
+                            dcc.RadioItems(
+                                id='seasonal-mode-radio',
+                                options=[{'label': 'Classical (365)', 'value': 'classical'},
+                                         {'label': 'STL (7, 30, 365)', 'value': 'stl'}],
+                                value='classical',
+                                labelStyle={'display': 'inline-block', 'marginRight': '1rem'},
+                                style=dict(fontFamily='Courier')),
                             html.Div([
                                 dcc.Graph(id="seasonal_plots")  
                             ])
@@ -712,6 +1038,33 @@ def render_page_content(pathname):
                 ], width=6),
             ], align='center'), 
 
+            html.Br(),
+
+            # Stationarity Tests
+            dbc.Row([
+                dbc.Col([
+                html.H4("Stationarity Tests (p-values)", className="card-title", style={"fontFamily": "courier",
+                                                                      "textAlign":"center"}),
+                    dbc.Card(
+                        dbc.CardBody([
+                            dash_table.DataTable(
+                                id='stationarity_table',
+                                columns=[{'name': 'Component', 'id': 'variable'},
+                                         {'name': 'ADF (levels)', 'id': 'adf_level', 'type': 'numeric'},
+                                         {'name': 'KPSS (levels)', 'id': 'kpss_level', 'type': 'numeric'},
+                                         {'name': 'ADF (differences)', 'id': 'adf_diff', 'type': 'numeric'},
+                                         {'name': 'KPSS (differences)', 'id': 'kpss_diff', 'type': 'numeric'}],
+                                sort_action='native',
+                                style_header={'fontWeight': 'bold', 'backgroundColor': '#f0f8ff'},
+                                style_cell={'fontFamily': 'Courier', 'textAlign': 'center'},
+                                style_table={'overflowX': 'auto'}),
+                            html.P("ADF H0: unit root (p < 0.05: stationary). KPSS H0: stationary "
+                                   "(p < 0.05: not stationary, p-values clipped to 0.01 - 0.1).",
+                                   style={"fontFamily": "courier", "fontSize": 12, "marginTop": "0.5rem"}),
+                        ]),style={"border": "1px solid black"}),
+                ], width=12),
+            ], align='center'), 
+
      
         ],style={"border": "1px solid black","background-color": "#FDEEF4",'width':'73rem'})
     )]),style={"border": "2px solid black","background-color": "#FDEEF4",'width':'75rem'})
@@ -925,150 +1278,107 @@ def render_page_content(pathname):
 
 ###################################################     Callbacks         ########################################    
 
+# Presentation-only callbacks run in the browser (Dash clientside callbacks): they do not
+# need the data, so a slider move costs no request and no worker slot
+
 # Led & Slider Callback    
-@app.callback(
+app.clientside_callback(
+    "function(value) { return String(value); }",
     Output('my-LED-display-1', 'value'),
     Input('my-LED-display-slider-1', 'value')
 )
-def update_output(value):
-    return str(value)
 
 # Led 2 & Slider 2 Callback    
-@app.callback(
+app.clientside_callback(
+    "function(value) { return String(value); }",
     Output('my-LED-display-2', 'value'),
     Input('my-LED-display-slider-2', 'value')
 )
-def update_output(value):
-    return str(value)
 
 
 # this callback is use to toggle the "dash-bootstrap" class so you can see
 # the effect of the custom stylesheets when running the example app.
-@app.callback(Output("container", "className"), Input("toggle", "value"))
-def toggle_classname(value):
-    if 1 in value:
-        return "dash-bootstrap"
-    return ""
-
-
-############################################## Home Page Callbacks #################################################
-@app.callback(
-    Output(component_id='mean_indicator_plot', component_property='figure'),  
-    Input(component_id='btc-components-dropdown', component_property='value'),
-    Input(component_id='my-LED-display-slider-1', component_property='value'),      
-    Input(component_id='my-LED-display-slider-2', component_property='value')  
+app.clientside_callback(
+    "function(value) { return (value || []).indexOf(1) >= 0 ? 'dash-bootstrap' : ''; }",
+    Output("container", "className"), Input("toggle", "value")
 )
 
-# Mean Indicator
-def mean_indicator(selected_variable, selected_month, selected_year):
-
-    df = df_melted[df_melted["variable"] == selected_variable]
-    df = df[df["month"] == selected_month]
-    df = df[df["year"] == selected_year]
-    
-    mean_indicator = df.value.mean()
-
 
-    fig = go.Figure(go.Indicator(
-    mode = "number",
-       # gauge = {'shape': "bullet"},
-    value = round(mean_indicator,2),
-    domain = {'x': [0.1, 1], 'y': [0.2, 0.9]},
-    number = {'valueformat':',.0f'},         
-    title = {'text': ""}))
-
-    fig.update_layout(margin=dict(l=0, r=0, t=10, b=0),
-                          height=80,paper_bgcolor = "#fffafa")
-
-    fig.update_traces(number_font_family="courier")
-
-    return fig
+############################################## Home Page Callbacks #################################################
 
+# The indicators, the histogram and the two boxplots share their inputs, so they come
+# from one callback: the variable is looked up once per input change and only the
+# figures depending on the changed inputs are rebuilt (the others are left as they are)
+HOME_PAGE_PARTS = {
+    "btc-components-dropdown": ("indicators", "boxplot_y", "boxplot_m"),
+    "my-LED-display-slider-1": ("indicators", "boxplot_y"),
+    "my-LED-display-slider-2": ("indicators", "boxplot_m"),
+}
 
-# Min Indicator
 @app.callback(
-    Output(component_id='min_indicator_plot', component_property='figure'),  
+    Output(component_id='mean_indicator_plot', component_property='figure'),
+    Output(component_id='min_indicator_plot', component_property='figure'),
+    Output(component_id='max_indicator_plot', component_property='figure'),
+    Output(component_id='std_indicator_plot', component_property='figure'),
+    Output(component_id='distribution_hist_plot', component_property='figure'),
+    Output(component_id='distribution_bp_plot_y', component_property='figure'),
+    Output(component_id='distribution_bp_plot_m', component_property='figure'),
     Input(component_id='btc-components-dropdown', component_property='value'),
     Input(component_id='my-LED-display-slider-1', component_property='value'),
-    Input(component_id='my-LED-display-slider-2', component_property='value')  
-
+    Input(component_id='my-LED-display-slider-2', component_property='value')
 )
 
-# Mean Indicator
-def min_indicator(selected_variable, selected_month, selected_year):
-    df = df_melted[df_melted["variable"] == selected_variable]
-    df = df[df["month"] == selected_month]
-    df = df[df["year"] == selected_year]
+def home_page(selected_variable, selected_month, selected_year):
 
-    min_indicator = df.value.min()
+    # Inputs that changed (none on the initial call: build everything)
+    changed = {trigger["prop_id"].split(".")[0] for trigger in dash.callback_context.triggered}
+    parts = sorted({part for input_id in changed for part in HOME_PAGE_PARTS.get(input_id, ())})
+    if not parts:
+        parts = ["boxplot_m", "boxplot_y", "indicators"]
 
+    figures = home_page_figures(selected_variable, selected_month, selected_year, parts)
 
-    fig = go.Figure(go.Indicator(
-    mode = "number",
-       # gauge = {'shape': "bullet"},
-    value = round(min_indicator,2),
-    domain = {'x': [0.1, 1], 'y': [0.2, 0.9]},
-    number = {'valueformat':',.0f'},         
-    title = {'text': ""}))
+    indicators = figures.get("indicators", [dash.no_update] * 5)
+    return indicators + [figures.get("boxplot_y", dash.no_update), figures.get("boxplot_m", dash.no_update)]
 
-    fig.update_layout(margin=dict(l=0, r=0, t=10, b=0),
-                          height=80,paper_bgcolor = "#fffafa")
-    fig.update_traces(number_font_family="courier")
 
-    return fig
+# Home page figures of the given parts ({part: figure(s)})
+@callback_cache.memoize
+def home_page_figures(selected_variable, selected_month, selected_year, parts):
 
-@app.callback(
-    Output(component_id='max_indicator_plot', component_property='figure'),  
-    Input(component_id='btc-components-dropdown', component_property='value'),
-    Input(component_id='my-LED-display-slider-1', component_property='value'),
-    Input(component_id='my-LED-display-slider-2', component_property='value') 
+    df = variable_frame(selected_variable)
+    figures = {}
 
-)
+    if "indicators" in parts:
+        figures["indicators"] = [
+            indicator(summary_cube.mean(selected_variable, selected_year, selected_month)),
+            indicator(summary_cube.minimum(selected_variable, selected_year, selected_month)),
+            indicator(summary_cube.maximum(selected_variable, selected_year, selected_month)),
+            indicator(summary_cube.std(selected_variable, selected_year, selected_month)),
+            histogram(df[(df["month"] == selected_month) & (df["year"] == selected_year)])]
 
-# Max Indicator
-def max_indicator(selected_variable, selected_month, selected_year):
-    df = df_melted[df_melted["variable"] == selected_variable]
-    df = df[df["month"] == selected_month]
-    df = df[df["year"] == selected_year]
-    max_indicator = df.value.max()
+    if "boxplot_y" in parts:
+        figures["boxplot_y"] = boxplot(df[df["month"] == selected_month], "year", '#997a8d')
 
+    if "boxplot_m" in parts:
+        figures["boxplot_m"] = boxplot(df[df["year"] == selected_year], "month", "#666699")
 
-    fig = go.Figure(go.Indicator(
-    mode = "number",
-       # gauge = {'shape': "bullet"},
-    value = round(max_indicator,2),
-    domain = {'x': [0.1, 1], 'y': [0.2, 0.9]},
-    number = {'valueformat':',.0f'},   
-    title = {'text': ""}))
+    return figures
 
-    fig.update_layout(margin=dict(l=0, r=0, t=10, b=0),
-                          height=80,paper_bgcolor = "#fffafa")
-
-    fig.update_traces(number_font_family="courier")
 
-    return fig
+# Values of a variable with their month & year
+def variable_frame(selected_variable):
+    dates = pd.DatetimeIndex(panel.dates)
+    return pd.DataFrame({"value": panel.column(selected_variable), "month": dates.month, "year": dates.year})
 
-@app.callback(
-    Output(component_id='std_indicator_plot', component_property='figure'),  
-    Input(component_id='btc-components-dropdown', component_property='value'),
-    Input(component_id='my-LED-display-slider-1', component_property='value'),
-    Input(component_id='my-LED-display-slider-2', component_property='value') 
-
-)
-# Standard Deviation Indicator
-def std_indicator(selected_variable, selected_month, selected_year):
-    df = df_melted[df_melted["variable"] == selected_variable]
-    df = df[df["month"] == selected_month]
-    df = df[df["year"] == selected_year]  
-
-
-    std_indicator = df.value.std()
 
+# Mean / Min / Max / Standard Deviation Indicator
+def indicator(value):
 
     fig = go.Figure(go.Indicator(
     mode = "number",
        # gauge = {'shape': "bullet"},
-    value = round(std_indicator,2),
+    value = round(value,2),
     domain = {'x': [0.1, 1], 'y': [0.2, 0.9]},
     number = {'valueformat':',.0f'},         
     title = {'text': ""}))
@@ -1081,21 +1391,40 @@ def std_indicator(selected_variable, selected_month, selected_year):
     return fig
 
 
+# Trend charts are downsampled (see downsample.py) and redrawn at full resolution for the
+# range the user zooms to: the visible range of the relayoutData event (None: the whole
+# history, also when the selection changed), no_update for events leaving the x axis alone
+def chart_window(relayout_data):
+    triggered = [t["prop_id"] for t in dash.callback_context.triggered]
+    if not any(prop.endswith(".relayoutData") for prop in triggered):
+        return None
+    if not downsample.moves_x(relayout_data):
+        return dash.no_update
+    return downsample.visible_range(relayout_data)
+
+
 @app.callback(
     Output(component_id='areachart_trend_plot', component_property='figure'),  
-    Input(component_id='btc-components-dropdown', component_property='value')
+    Input(component_id='btc-components-dropdown', component_property='value'),
+    Input(component_id='areachart_trend_plot', component_property='relayoutData')
 
 )
 # Area Chart Trend
-def areachart_trend(selected_variable):
+def areachart_trend(selected_variable, relayout_data):
+    window = chart_window(relayout_data)
+    if window is dash.no_update:
+        return dash.no_update
+    return areachart_trend_figure(selected_variable, window)
+
+@callback_cache.memoize
+def areachart_trend_figure(selected_variable, window):
 
-    df = df_melted[df_melted["variable"] == selected_variable]
-    
-    
     fig = go.Figure()
     
-    fig.add_trace(go.Scatter(x=df.Date, 
-                             y=df.value, 
+    values = panel.column(selected_variable)
+    rows = downsample.resample(panel.dates, values, window)
+    fig.add_trace(downsample.scatter(len(rows))(x=panel.dates[rows], 
+                             y=values[rows], 
         name="Close",
         line=dict(
             color='#9c7c38',         
@@ -1124,6 +1453,7 @@ def areachart_trend(selected_variable):
                             font_family="Courier", # Set Font style
                             font_size=14, # Set Font size) # legend false  
                             height=275,
+                            uirevision=selected_variable, # Keep the zoom when redrawn for it
                             margin=dict(l=30, r=20, t=10, b=0))
     
     fig.update_xaxes(
@@ -1145,20 +1475,8 @@ def areachart_trend(selected_variable):
     return fig
 
 
-@app.callback(
-    Output(component_id='distribution_hist_plot', component_property='figure'),  
-    Input(component_id='btc-components-dropdown', component_property='value'),
-    Input(component_id='my-LED-display-slider-1', component_property='value'),
-    Input(component_id='my-LED-display-slider-2', component_property='value')      
-
-)
-
 # Histogram
-def histogram(selected_variable, selected_month, selected_year):
-    df = df_melted[df_melted["variable"] == selected_variable]
-    df = df[df["month"] == selected_month]
-    df = df[df["year"] == selected_year]  
-  
+def histogram(df):
     
     close_histogram = go.Figure()
 
@@ -1176,35 +1494,19 @@ def histogram(selected_variable, selected_month, selected_year):
     return close_histogram
 
 
-
-
-# Boxplot Yearly
-@app.callback(
-    Output(component_id='distribution_bp_plot_y', component_property='figure'),  
-    Input(component_id='btc-components-dropdown', component_property='value'),
-    Input(component_id='my-LED-display-slider-1', component_property='value')    
-
-)
-
-
-def boxplot_y(selected_variable, selected_month):
-    
-    colorscale = ['#997a8d']
-    
-    df = df_melted[df_melted["variable"] == selected_variable]
-    df = df[df["month"] == selected_month]    
+# Boxplot Yearly (x="year") / Monthly (x="month")
+def boxplot(df, x, color):
     
+    colorscale = [color]
 
     box_plot_fig = px.box(df, 
-                          x="year", 
+                          x=x, 
                           y="value",                
                           notched=True, # used notched shape
                           title="",
                           template='seaborn',
                           color_discrete_sequence=colorscale,
                           points="all")
-                        
-                
 
 
     box_plot_fig.update_yaxes(title_text = '')
@@ -1216,41 +1518,6 @@ def boxplot_y(selected_variable, selected_month):
 
     return box_plot_fig 
 
-# Boxplot Monthly
-@app.callback(
-    Output(component_id='distribution_bp_plot_m', component_property='figure'),  
-    Input(component_id='btc-components-dropdown', component_property='value'),
-    Input(component_id='my-LED-display-slider-2', component_property='value')     
-
-)
-
-
-def boxplot_m(selected_variable,selected_year):
-    
-    colorscale = ["#666699"]
-    
-    df = df_melted[df_melted["variable"] == selected_variable]
-    df = df[df["year"] == selected_year]    
-
-    box_plot_fig = px.box(df, 
-                          x="month", 
-                          y="value",                
-                          notched=True, # used notched shape
-                          title="",
-                          template='seaborn',
-                          color_discrete_sequence=colorscale,
-                          points="all")
-
-
-    box_plot_fig.update_yaxes(title_text = '')
-    box_plot_fig.update_layout(template= 'gridon', 
-                               height = 275,
-                               font_family="Courier", # Set Font style
-                               font_size=14, # Set Font size) # legend false                            
-                               margin=dict(l=50, r=0, t=20, b=40))
-
-    return box_plot_fig 
-
 
 
 ############################################## Page 1 Callbacks #################################################
@@ -1263,29 +1530,13 @@ def boxplot_m(selected_variable,selected_year):
 
 )
 
+@callback_cache.memoize
 def correlation(selected_variable, start_date, end_date):
     
-
-    
-    
-    
-    df = df_melted[(df_melted["variable"] == "Close") |
-                   (df_melted["variable"]== selected_variable)]
-
-
-    df = df.loc[df["Date"].between(*pd.to_datetime([start_date, end_date]))]
-    
-    
-    
-    df = df.iloc[:,0:3]
-
-    
-    df = df.pivot(index='Date', columns='variable', values='value')
-    
-    corr_test = df.iloc[:,0:2].corr()
+    close = panel.column("Close", start_date, end_date)
+    variable = panel.column(selected_variable, start_date, end_date)
     
-
-    corr_test = corr_test["Close"].iloc[1:2].values[0]
+    corr_test = np.corrcoef(close, variable)[0, 1]
 
 
     fig_corr_test = go.Figure(go.Indicator(
@@ -1315,23 +1566,10 @@ def correlation(selected_variable, start_date, end_date):
 )
 
 
+@callback_cache.memoize
 def cointegration(selected_variable, start_date, end_date):
     
-    df = df_melted[(df_melted["variable"] == "Close") |
-                   (df_melted["variable"]== selected_variable)]
-
-
-    df = df.loc[df["Date"].between(*pd.to_datetime([start_date, end_date]))]
-    
-    
-    
-    df = df.iloc[:,0:3]
-    
-    df = df.pivot(index='Date', columns='variable', values='value')
-    
-    score,pvalue,_=coint(df.iloc[:, 0],df.iloc[:, 1])
-
-    pvalue = pvalue
+    pvalue = cointegration_pvalue(selected_variable, start_date, end_date)
 
 
     fig_corr_test = go.Figure(go.Indicator(
@@ -1360,39 +1598,16 @@ def cointegration(selected_variable, start_date, end_date):
 
 )
    
+@callback_cache.memoize
 def causality(selected_component, start_date, end_date):
     
-    
-    df = df_melted[(df_melted["variable"] == "Close") |
-                   (df_melted["variable"]== selected_component)]
-
+    # Granger Causality of Close on Close and the selected component only (the whole table is
+    # left to the background job, see causality_job)
+    variables = sorted({"Close", selected_component})
+    p_values = close_causality_pvalues(start_date, end_date, maxlag=4, variables=variables).values
 
-    df = df.loc[df["Date"].between(*pd.to_datetime([start_date, end_date]))]  
-    
-    df = df.iloc[:,0:3]
-    
-    df = df.pivot(index='Date', columns='variable', values='value')
-    
-    data = df
-    
-  
-    variables=data.columns  
-    matrix = pd.DataFrame(np.zeros((len(variables), len(variables))), columns=variables, index=variables)
-    for col in matrix.columns:
-        for row in matrix.index:
-            test_result = grangercausalitytests(data[[row, col]], maxlag=4, verbose=False)            
-            p_values = [round(test_result[i+1][0]['ssr_chi2test'][1],4) for i in range(4)]            
-            min_p_value = np.min(p_values)
-            matrix.loc[row, col] = min_p_value
-    matrix.columns = [var + '_x' for var in variables]
-    matrix.index = [var + '_y' for var in variables]
-    
-    matrix = matrix["Close_x"].to_frame()
-    
-    matrix = matrix.reset_index()
-
-    matrix = matrix.rename(columns={ "index": "Components",
-                                     "Close_x": "p-value"}).sort_values("p-value", ascending=True) 
+    matrix = pd.DataFrame({"Components": [var + '_y' for var in variables],
+                           "p-value": p_values}).sort_values("p-value", ascending=True) 
     
     
     
@@ -1418,6 +1633,46 @@ def causality(selected_component, start_date, end_date):
 
 
 
+# Rolling Correlation & Cointegration
+@app.callback(
+    Output(component_id='rolling_plot', component_property='figure'),  
+    Input(component_id='btc-components-dropdown', component_property='value'),
+    Input(component_id='rolling-window-dropdown', component_property='value')
+
+)
+
+@callback_cache.memoize
+def rolling_plot(selected_variable, window):
+
+    correlation, cointegration = rolling_statistics(selected_variable, window)
+
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                        subplot_titles=("Correlation with Close", "Cointegration p-value"))
+
+    fig.add_trace(go.Scatter(x=correlation.index, y=correlation.values, name="Correlation",
+                             line=dict(color='#9c7c38', width=2)), row=1, col=1)
+
+    fig.add_trace(go.Scatter(x=cointegration.index, y=cointegration.values, name="p-value",
+                             line=dict(color='#666699', width=2)), row=2, col=1)
+
+    # 5% significance level
+    fig.add_hline(y=0.05, line_dash="dash", line_color="#c41e3a", row=2, col=1)
+
+    fig.update_yaxes(range=[-1, 1], row=1, col=1)
+    fig.update_yaxes(range=[0, 1], row=2, col=1)
+    fig.update_layout(template= 'gridon',  
+                      font_family="Courier", # Set Font style
+                      font_size=14, # Set Font size) # legend false  
+                      showlegend=False,
+                      height=450,
+                      margin=dict(l=30, r=20, t=30, b=0))
+
+        # Add Spikes
+    fig.update_xaxes(showspikes=True)
+    fig.update_yaxes(showspikes=True)
+    return fig
+
+
 # Scatter Matrix
 @app.callback(
     Output(component_id='correlation_matrix_plot', component_property='figure'),  
@@ -1429,28 +1684,15 @@ def causality(selected_component, start_date, end_date):
 
 
 
+@callback_cache.memoize
 def scatter_matrix(selected_variable,  start_date, end_date):
     
-    df = df_melted[
-        (df_melted["variable"]== selected_variable)|      
-        (df_melted["variable"] == "Close")
-                   ]
-
-    df = df.loc[df["Date"].between(*pd.to_datetime([start_date, end_date]))]  
-    
-    
-    
-    df = df.iloc[:,0:3]
-
-    
-    df = df.pivot(index='Date', columns='variable', values='value')
-    
 
     fig = go.Figure()
 
     fig.add_trace(go.Splom(dimensions=[
-        dict(label=selected_variable, values = df[selected_variable]),       
-        dict(label='Close', values = df['Close'])],
+        dict(label=selected_variable, values = panel.column(selected_variable, start_date, end_date)),       
+        dict(label='Close', values = panel.column("Close", start_date, end_date))],
                            marker = dict(color = "#b0c4de",
                                          opacity = 0.8,
                                          size=15,
@@ -1475,42 +1717,38 @@ def scatter_matrix(selected_variable,  start_date, end_date):
 # Standardised Trend
 @app.callback(
     Output(component_id='standardised_trend_plot', component_property='figure'),  
-    Input(component_id='btc-components-dropdown', component_property='value')
+    Input(component_id='btc-components-dropdown', component_property='value'),
+    Input(component_id='standardised_trend_plot', component_property='relayoutData')
 
 )
-def standardised_trend(selected_variable):
+def standardised_trend(selected_variable, relayout_data):
+    window = chart_window(relayout_data)
+    if window is dash.no_update:
+        return dash.no_update
+    return standardised_trend_figure(selected_variable, window)
 
-    #df = df_melted[df_melted["month"] == selected_month]
-    #df = df_melted[df_melted["year"] == selected_year]
+@callback_cache.memoize
+def standardised_trend_figure(selected_variable, window):
 
-    
-    df_close = df_melted.query("variable == 'Close'") 
-
-    cols_1 = ["value"]
-    corr_1_scaled = StandardScaler()
-    df_close[cols_1] = corr_1_scaled.fit_transform(df_close[cols_1])
-    
-
-    df = df_melted[df_melted["variable"] == selected_variable]      
-    
-    cols_2 = ["value"]
-    corr_2_scaled = StandardScaler()
-    df[cols_2] = corr_2_scaled.fit_transform(df[cols_2])   
+    close_scaled = derived.column("zscore", "Close")
+    variable_scaled = derived.column("zscore", selected_variable)
     
     block_fig = go.Figure()
 
-    block_fig.add_trace(go.Scatter(
-        x=df_close.Date, 
-        y=df_close.value, 
+    rows = downsample.resample(panel.dates, close_scaled, window)
+    block_fig.add_trace(downsample.scatter(len(rows))(
+        x=panel.dates[rows], 
+        y=close_scaled[rows], 
         name="Close",
         line=dict(
             color='#9c7c38',
             width=2)
     ))
 
-    block_fig.add_trace(go.Scatter(
-        x=df.Date,                         
-        y=df.value,                          
+    rows = downsample.resample(panel.dates, variable_scaled, window)
+    block_fig.add_trace(downsample.scatter(len(rows))(
+        x=panel.dates[rows],                         
+        y=variable_scaled[rows],                          
         name=selected_variable,
         line=dict(
             color="#989898",
@@ -1529,6 +1767,7 @@ def standardised_trend(selected_variable):
                             height=325,
                             font_family="Courier", # Set Font style
                             font_size=14, # Set Font size) # legend false                         
+                            uirevision=selected_variable,
                             margin=dict(l=40, r=0, t=30, b=40))
     
     block_fig.update_xaxes(
@@ -1554,44 +1793,48 @@ def standardised_trend(selected_variable):
 
 
 # Causality Table
+# Windows missing from the result store are computed by a background job (see jobs.py):
+# the page submits the window, polls the job (pairs done / total) and shows the table when done
 @app.callback(
     Output(component_id='causality_table', component_property='figure'),  
+    Output(component_id='causality-job-progress', component_property='value'),
+    Output(component_id='causality-job-progress', component_property='label'),
+    Output(component_id='causality-job-progress', component_property='style'),
+    Output(component_id='causality-job-poll', component_property='disabled'),
     Input(component_id='date-picker-range', component_property='start_date'),
-    Input(component_id='date-picker-range', component_property='end_date')    
+    Input(component_id='date-picker-range', component_property='end_date'),
+    Input(component_id='causality-job-poll', component_property='n_intervals')
 
 )
 
-def causality_results(start_date, end_date):
-    
-    df_2 = df
-    
-    df_2["Date"] = pd.to_datetime(df_2["Date"])
-    df_2["month"] = df_2["Date"].dt.month
-    df_2["year"] = df_2["Date"].dt.year
-    
+def causality_job(start_date, end_date, n_intervals):
+    start, end = window_key(start_date, end_date)
+    hidden, shown = {"display": "none"}, {"height": "1.5rem"}
 
-    df_2 = df_2.loc[df_2["Date"].between(*pd.to_datetime([start_date, end_date]))]  
-    
-    data_filtered = df_2.set_index("Date")
-    
-    data_filtered = data_filtered.drop(columns=["month", "year", "returns", "log_returns"])
-    
-    # Calculate the Granger Causality
-    variables=data_filtered.columns  
-    matrix = pd.DataFrame(np.zeros((len(variables), len(variables))), columns=variables, index=variables)
-    for col in matrix.columns:
-        for row in matrix.index:
-            test_result = grangercausalitytests(data_filtered [[row, col]], maxlag=4, verbose=False)            
-            p_values = [round(test_result[i+1][0]['ssr_chi2test'][1],4) for i in range(4)]            
-            min_p_value = np.min(p_values)
-            matrix.loc[row, col] = min_p_value
+    # Already stored (precomputed or computed before)
+    if len(results.get_many("granger", panel.variables, start, end, 4)) == len(panel.variables):
+        return causality_results(start, end), 100, "", hidden, True
+
+    # Submitting again while polling finds the same job (a failed one is only retried on a new selection)
+    polling = any(trigger["prop_id"].startswith("causality-job-poll") for trigger in dash.callback_context.triggered)
+    job = job_queue.submit("granger_table", dict(start=start, end=end, maxlag=4), retry=not polling)
+
+    if job["status"] == "done":
+        return causality_results(start, end), 100, "", hidden, True
+    if job["status"] == "failed":
+        return dash.no_update, 100, "Failed: %s" % job["error"], shown, True
 
+    done, total = job["done"], job["total"] or len(panel.variables)
+    return dash.no_update, 100 * done / total, "%d / %d pairs" % (done, total), shown, False
 
-    matrix.columns = [var  for var in variables]
-    matrix.index = [var for var in variables]
 
-    # Select only the p-value for the Close Price
-    matrix = matrix["Close"].to_frame()
+@callback_cache.memoize
+def causality_results(start_date, end_date):
+    
+    # Calculate the Granger Causality (only the Close Price column of the matrix is used)
+    p_values = close_causality_pvalues(start_date, end_date, maxlag=4)
+
+    matrix = p_values.drop(["returns", "log_returns"]).to_frame("Close")
     
     matrix = matrix[matrix["Close"] <= 0.05]
     
@@ -1619,16 +1862,10 @@ def causality_results(start_date, end_date):
 )
 
 
+@callback_cache.memoize
 def ad_fuller(selected_variable):
 
-    df = df_melted[df_melted["variable"] == selected_variable]
-    
-    value = df.value.values
-    result = adfuller(value)
-
-    adf = result[0]
-
-    pvalue = result[1]
+    pvalue = stationarity_pvalues().loc[selected_variable, "adf_level"]
 
     fig = go.Figure(go.Indicator(
     mode = "number",
@@ -1646,24 +1883,44 @@ def ad_fuller(selected_variable):
 
 
 
+# Stationarity Tests Table (the selected component highlighted)
 @app.callback(
-    Output(component_id='volatility_trend_plot', component_property='figure'),  
+    Output(component_id='stationarity_table', component_property='data'),  
+    Output(component_id='stationarity_table', component_property='style_data_conditional'),  
     Input(component_id='btc-components-dropdown', component_property='value')
 
+)
+def stationarity_table(selected_variable):
+
+    table = stationarity_pvalues().round(5)
+    data = [dict(variable=variable, **{test: (None if np.isnan(p) else p) for test, p in row.items()})
+            for variable, row in table.iterrows()]
+    style = [{'if': {'filter_query': '{variable} = "%s"' % selected_variable},
+              'backgroundColor': '#b0c4de', 'fontWeight': 'bold'}]
+    return data, style
+
+
+@app.callback(
+    Output(component_id='volatility_trend_plot', component_property='figure'),  
+    Input(component_id='btc-components-dropdown', component_property='value'),
+    Input(component_id='volatility_trend_plot', component_property='relayoutData')
+
 )
 # Volatility Trend
-def volatility_trend(selected_variable):
+def volatility_trend(selected_variable, relayout_data):
+    window = chart_window(relayout_data)
+    if window is dash.no_update:
+        return dash.no_update
+    return volatility_trend_figure(selected_variable, window)
+
+@callback_cache.memoize
+def volatility_trend_figure(selected_variable, window):
     
     #df = df_melted[df_melted["month"] == selected_month]
     #df = df_melted[df_melted["year"] == selected_year]
-    df = df_melted[df_melted["variable"] == selected_variable] 
-
-    
-    df = df.set_index('Date')
-    
-    returns = 100 * df.value.pct_change().dropna()
+    returns = derived.series("pct_change", selected_variable).dropna()
 
-    returns = returns.reset_index()
+    returns = returns.rename("value").reset_index()
 
     # Variables to plug in the Confidence Interval Formula
     x = returns.value
@@ -1679,8 +1936,9 @@ def volatility_trend(selected_variable):
         # Create Figure
     fig = go.Figure()
 
-        # Add traces observed values 
-    fig.add_trace(go.Scatter(x=returns.Date, y=returns.value,
+        # Add traces observed values (min / max buckets: every spike is kept)
+    rows = downsample.resample(returns.Date, returns.value.values, window, method="minmax")
+    fig.add_trace(downsample.scatter(len(rows))(x=returns.Date.values[rows], y=returns.value.values[rows],
                             mode='lines',
                             line=dict(color='#666699', width=1),
                             name='Returns'))
@@ -1702,6 +1960,7 @@ def volatility_trend(selected_variable):
     fig.update_layout(hovermode="x", 
                         template =  'gridon', 
                          height = 300,
+                        uirevision=selected_variable,
                         margin=dict(l=40, r=0, t=20, b=20))
     
     fig.update_xaxes(
@@ -1728,115 +1987,108 @@ def volatility_trend(selected_variable):
 
 
 
-# PACF / ACF 
+# Conditional Volatility
 @app.callback(
-    Output(component_id='pacf_acf_plot', component_property='figure'),  
-    Input(component_id='btc-components-dropdown', component_property='value')
+    Output(component_id='conditional_volatility_plot', component_property='figure'),  
+    Input(component_id='btc-components-dropdown', component_property='value'),
+    Input(component_id='volatility-model-dropdown', component_property='value'),
+    Input(component_id='volatility-window-dropdown', component_property='value')
 
 )
-def acf_pacf(selected_variable):
-    
-    #df = df_melted[df_melted["month"] == selected_month]
-    #df = df_melted[df_melted["year"] == selected_year]
-    df = df_melted[df_melted["variable"] == selected_variable]
-    
-    df = df.set_index('Date')
-    returns = 100 * df.value.pct_change().dropna()
-
-    returns = returns.reset_index() 
-    
-    # Create subplots figure
-    autocorrelation_plots = make_subplots(rows=2, cols=1, subplot_titles=("Partial Autocorrelation", "Autocorrelation"))
-
-    # Partial Autocorrelation Plot (PACF)
-    corr_array = pacf((returns.value[-1825:]).dropna(), alpha=0.05) 
-    lower_y = corr_array[1][:,0] - corr_array[0]
-    upper_y = corr_array[1][:,1] - corr_array[0]
-
-    # Autocorrelation Plot (ACF)
-    corr_array_acf = acf((returns.value[-1825:]).dropna(), alpha=0.05) 
-    lower_acf = corr_array_acf[1][:,0] - corr_array_acf[0]
-    upper_acf = corr_array_acf[1][:,1] - corr_array_acf[0]
-
-
-    # Partial Autocorrelation Plot
-    [autocorrelation_plots.add_trace(go.Scatter(x=(x,x), 
-                                  y=(0,corr_array[0][x]), 
-                                  mode='lines',
-                                  line_color='#3f3f3f',
-                                  name = 'PACF'),
-                       row=1,col=1)
-
+@callback_cache.memoize
+def conditional_volatility_plot(selected_variable, model, window):
 
-        for x in range(len(corr_array[0]))]
+    returns, fitted, forecast = volatility_model(selected_variable, model, window)
 
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                        subplot_titles=("Returns (95% band)", "Volatility (fitted / %d-day forecast)" % VOLATILITY_HORIZON))
 
-    autocorrelation_plots.add_trace(go.Scatter(x=np.arange(len(corr_array[0])), 
-                                 y=corr_array[0], 
-                                 mode='markers', 
-                                 marker_color='#090059',
-                                 marker_size=12,
-                                 name = 'PACF'),
-                      row=1,col=1)
+    # 95% band of the returns from the fitted conditional volatility
+    center = float(np.mean(returns.values))
+    fig.add_trace(go.Scatter(x=fitted.index, y=center + 1.960 * fitted.values, mode='lines',
+                             line=dict(width=0), hoverinfo='skip', name='Upper'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=fitted.index, y=center - 1.960 * fitted.values, mode='lines',
+                             line=dict(width=0), fill='tonexty', fillcolor='rgba(176, 196, 222, 0.5)',
+                             hoverinfo='skip', name='Lower'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=returns.index, y=returns.values, mode='lines',
+                             line=dict(color='#666699', width=1), name='Returns'), row=1, col=1)
 
-    autocorrelation_plots.add_trace(go.Scatter(x=np.arange(len(corr_array[0])), 
-                                 y=upper_y, 
-                                 mode='lines', 
-                                 line_color='rgba(255,255,255,0)',
-                                 name = 'Upper Bound'),
-                     row=1,col=1)
+    fig.add_trace(go.Scatter(x=fitted.index, y=fitted.values, mode='lines',
+                             line=dict(color='#9c7c38', width=2), name='Fitted'), row=2, col=1)
+    fig.add_trace(go.Scatter(x=forecast.index, y=forecast.values, mode='lines',
+                             line=dict(color='#c41e3a', width=2, dash='dash'), name='Forecast'), row=2, col=1)
 
+    fig.update_layout(template= 'gridon',  
+                      font_family="Courier", # Set Font style
+                      font_size=14, # Set Font size) # legend false  
+                      showlegend=False,
+                      hovermode="x",
+                      height=500,
+                      margin=dict(l=40, r=20, t=30, b=0))
 
-    autocorrelation_plots.add_trace(go.Scatter(x=np.arange(len(corr_array[0])), 
-                                 y=lower_y, 
-                                 mode='lines',
-                                 fillcolor='rgba(32, 146, 230,0.3)',
-                                 fill='tonexty', 
-                                 line_color='rgba(255,255,255,0)',
-                                 name = 'Lower Bound'),
-                     row=1,col=1)
-
-
-
-
-
-    [autocorrelation_plots.add_trace(go.Scatter(x=(x,x), 
-                                  y=(0,corr_array_acf[0][x]), 
-                                  mode='lines',
-                                  line_color='#3f3f3f',
-                                  name = 'ACF'), 
-                      row =2, col=1)
-
-
-        for x in range(len(corr_array_acf[0]))]
-
+        # Add Spikes
+    fig.update_xaxes(showspikes=True)
+    fig.update_yaxes(showspikes=True)
+    return fig
 
-    autocorrelation_plots.add_trace(go.Scatter(x=np.arange(len(corr_array_acf[0])), 
-                                 y=corr_array_acf[0], 
-                                 mode='markers', 
-                                 marker_color='#090059',
-                                 marker_size=12,
-                                 name = 'ACF'),
-                      row =2, col=1)
 
+# PACF / ACF 
+@app.callback(
+    Output(component_id='pacf_acf_plot', component_property='figure'),  
+    Input(component_id='btc-components-dropdown', component_property='value')
 
-    autocorrelation_plots.add_trace(go.Scatter(x=np.arange(len(corr_array_acf[0])), 
-                                 y=upper_acf, 
-                                 mode='lines', 
-                                 line_color='rgba(255,255,255,0)',
-                                 name = 'Upper Bound'),
-                      row =2, col=1)
+)
+@callback_cache.memoize
+def acf_pacf(selected_variable):
 
-    autocorrelation_plots.add_trace(go.Scatter(x=np.arange(len(corr_array_acf[0])),
-                                 y=lower_acf, 
-                                 mode='lines',
-                                 fillcolor='rgba(32, 146, 230,0.3)',
-                                 fill='tonexty', 
-                                 line_color='rgba(255,255,255,0)',
-                                 name = 'Lower Bound'),
-                      row=2,col=1)
+    table = autocorrelations()
 
+    # Create subplots figure
+    autocorrelation_plots = make_subplots(rows=2, cols=1, subplot_titles=("Partial Autocorrelation", "Autocorrelation"))
 
+    # Components with too few days of changes have no autocorrelations: empty axes and a message
+    if selected_variable in table:
+        pacf, pacf_interval, acf, acf_interval = table[selected_variable]
+        plots = [(1, 'PACF', pacf, pacf_interval), (2, 'ACF', acf, acf_interval)]
+    else:
+        plots = []
+        autocorrelation_plots.add_annotation(text="Not enough data", xref="paper", yref="paper",
+                                             x=0.5, y=0.5, showarrow=False)
+
+    for row, name, values, interval in plots:
+        lags = np.arange(len(values))
+
+        # Stems: one trace, a (lag, 0) - (lag, value) segment per lag
+        autocorrelation_plots.add_trace(go.Scatter(x=stem_segments(lags, lags),
+                                     y=stem_segments(np.zeros(len(values)), values),
+                                     mode='lines',
+                                     line_color='#3f3f3f',
+                                     name = name),
+                          row=row,col=1)
+
+        autocorrelation_plots.add_trace(go.Scatter(x=lags, 
+                                     y=values, 
+                                     mode='markers', 
+                                     marker_color='#090059',
+                                     marker_size=12,
+                                     name = name),
+                          row=row,col=1)
+
+        autocorrelation_plots.add_trace(go.Scatter(x=lags, 
+                                     y=interval, 
+                                     mode='lines', 
+                                     line_color='rgba(255,255,255,0)',
+                                     name = 'Upper Bound'),
+                          row=row,col=1)
+
+        autocorrelation_plots.add_trace(go.Scatter(x=lags,
+                                     y=-interval, 
+                                     mode='lines',
+                                     fillcolor='rgba(32, 146, 230,0.3)',
+                                     fill='tonexty', 
+                                     line_color='rgba(255,255,255,0)',
+                                     name = 'Lower Bound'),
+                          row=row,col=1)
 
 
     # Update Figures
@@ -1864,23 +2116,16 @@ def acf_pacf(selected_variable):
 # Seasonality Components
 @app.callback(
     Output(component_id='seasonal_plots', component_property='figure'),  
-    Input(component_id='btc-components-dropdown', component_property='value')
+    Input(component_id='btc-components-dropdown', component_property='value'),
+    Input(component_id='seasonal-mode-radio', component_property='value')
 
 )
-def seasonality_components(selected_variable):
-    
-    #df = df_melted[df_melted["month"] == selected_month]
-    #df = df_melted[df_melted["year"] == selected_year]
-    df = df_melted[df_melted["variable"] == selected_variable]
+@callback_cache.memoize
+def seasonality_components(selected_variable, mode):
     
-    df = df.set_index('Date')
-    returns = 100 * df.value.pct_change().dropna()
+    result = decompositions(mode)[selected_variable]
+    periods = [column for column in result.columns if column.startswith("seasonal_")]
 
-    #returns = returns.reset_index()    
-
-    result = seasonal_decompose(
-                returns, model='additive', filt=None, period=365,
-                two_sided=True, extrapolate_trend=0)
     seasonal = make_subplots(
                 rows=4, cols=1,
                 subplot_titles=["Observed", "Trend", "Seasonal", "Residuals"])
@@ -1894,8 +2139,13 @@ def seasonality_components(selected_variable):
                     row=2, col=1
                 )
 
-    seasonal.add_trace(
-                go.Scatter(x=result.seasonal.index, y=result.seasonal, mode='lines', name = "Seasonal", marker_color='#666699'),
+    # One line per period in the STL mode
+    colors = ['#666699', '#9c7c38', '#c41e3a']
+    for k, column in enumerate(periods if len(periods) > 1 else ["seasonal"]):
+        seasonal.add_trace(
+                go.Scatter(x=result.seasonal.index, y=result[column], mode='lines',
+                           name = "Seasonal" if column == "seasonal" else "Seasonal (%s)" % column.split("_")[1],
+                           marker_color=colors[k % len(colors)]),
                     row=3, col=1
                 )
 
@@ -1921,217 +2171,61 @@ def seasonality_components(selected_variable):
 ############################################## Page 3 Callbacks #################################################
  
 ############################################## Page 1 Callbacks #################################################
-# Correlation 2
+# Correlation 2 / Cointegration 2 / Causality 2
+# The three statistics share their inputs and their sample: the returns / sentiment pair
+# of the influencer & year is built once and feeds all three indicators in one response
 @app.callback(
     Output(component_id='correlation_plot_2', component_property='figure'),  
+    Output(component_id='cointegration_plot_2', component_property='figure'),  
+    Output(component_id='causality_plot_2', component_property='figure'),  
     Input(component_id='tweets-dropdown', component_property='value'),
     Input(component_id='my-LED-display-slider-2', component_property='value')    
 
 )
 
-def correlation_2(selected_influencer,  selected_year):
-    
-    close = df[["Date","returns"]]
-    
-    sentiment = tweets_df[["Datetime", "sentiment", "Username"]].sort_values("Datetime")
-    sentiment["Datetime"] = pd.to_datetime(sentiment["Datetime"], format = '%Y/%m/%d').dt.tz_localize(None)
-    
-    sentiment["Datetime"]  = sentiment["Datetime"].dt.date
+@callback_cache.memoize
+def sentiment_statistics(selected_influencer, selected_year):
     
-    sentiment["Datetime"] = pd.to_datetime(sentiment["Datetime"], format = '%Y/%m/%d')    
-    sentiment["month"]  = sentiment["Datetime"].dt.month
-    sentiment["year"]  = sentiment["Datetime"].dt.year
+    df_filtered_2 = sentiment_pair(selected_influencer, selected_year)
     
-    
-    
-    sentiment=sentiment.groupby(["Datetime", "month", "year", "Username"], as_index=False)\
-    .mean().sort_values("Datetime")
-
-    sentiment = sentiment.set_index("Datetime")
-    close = close.set_index("Date")
-    sentiment = sentiment.interpolate()
-    close = close["2016-07-08": "2022-06-30"]
-    close = close.reset_index()
-    sentiment = sentiment.reset_index()
-    df_corr_sentiment  = pd.concat([sentiment, close], axis=1)
-    df_corr_sentiment = df_corr_sentiment[["Datetime", "month", "year", "sentiment", "Username", "returns"]]
-    df_corr_sentiment = df_corr_sentiment.set_index("Datetime")
-
-    df_final = df_corr_sentiment
-    
-    df_filtered = df_final[df_final["Username"] == selected_influencer]
-    
-    df_filtered_2 = df_filtered[                 
-                                (df_filtered["year"] == selected_year)]
-    
-    
-    
-    df_corr = df_filtered_2[["returns", "sentiment"]]
+    data = df_filtered_2[["returns", "sentiment"]]
 
-    
-    corr_test = df_corr.corr()
-    
+    # Correlation
+    corr_test = data.corr()
 
     df_corr_sentiment = corr_test["returns"][1]
 
-    fig_corr_test = go.Figure(go.Indicator(
-    mode = "number",
-       # gauge = {'shape': "bullet"},
-    value = round(df_corr_sentiment,6),
-    domain = {'x': [0.1, 1], 'y': [0.2, 0.9]},
-    number = {'valueformat':'.4f'},        
-    title = {'text': ""}))
-
-    fig_corr_test.update_layout(margin=dict(l=0, r=0, t=0, b=0),
-                          height=60,paper_bgcolor = "#fffafa")
-
-    fig_corr_test.update_traces(number_font_family="courier")
-
-    return fig_corr_test
-
+    # Cointegration
+    # No returns on the influencer's days (e.g. before the BTC data starts)
+    if len(data) < MIN_SENTIMENT_DAYS:
+        pvalue = np.nan
+    else:
+        score,pvalue,_=stattools.coint(data["returns"],data["sentiment"])
 
-# Cointegration 2
-@app.callback(
-    Output(component_id='cointegration_plot_2', component_property='figure'),  
-    Input(component_id='tweets-dropdown', component_property='value'),
-    Input(component_id='my-LED-display-slider-2', component_property='value')    
-
-)
-
-def cointegration_2(selected_influencer,  selected_year):
-    
-    close = df[["Date","returns"]]
-    
-    sentiment = tweets_df[["Datetime", "sentiment", "Username"]].sort_values("Datetime")
-    sentiment["Datetime"] = pd.to_datetime(sentiment["Datetime"], format = '%Y/%m/%d').dt.tz_localize(None)
-    
-    sentiment["Datetime"]  = sentiment["Datetime"].dt.date
-    
-    sentiment["Datetime"] = pd.to_datetime(sentiment["Datetime"], format = '%Y/%m/%d')    
-    sentiment["month"]  = sentiment["Datetime"].dt.month
-    sentiment["year"]  = sentiment["Datetime"].dt.year
-    
-    
-    
-    sentiment=sentiment.groupby(["Datetime", "month", "year", "Username"], as_index=False)\
-    .mean().sort_values("Datetime")
-
-    sentiment = sentiment.set_index("Datetime")
-    close = close.set_index("Date")
-    sentiment = sentiment.interpolate()
-    close = close["2016-07-08": "2022-06-30"]
-    close = close.reset_index()
-    sentiment = sentiment.reset_index()
-    df_corr_sentiment  = pd.concat([sentiment, close], axis=1)
-    df_corr_sentiment = df_corr_sentiment[["Datetime", "month", "year", "sentiment", "Username", "returns"]]
-    df_corr_sentiment = df_corr_sentiment.set_index("Datetime")
-
-    df_final = df_corr_sentiment
-    
-    df_filtered = df_final[df_final["Username"] == selected_influencer]
-    
-    df_filtered_2 = df_filtered[                  
-                                (df_filtered["year"] == selected_year)]
-    
-    
-    
-    df_coint = df_filtered_2[["returns", "sentiment"]]
+    # Granger Causality of returns on returns / sentiment
+    variables=data.columns  
+    if len(data) < MIN_SENTIMENT_DAYS:
+        p_values = np.full(len(variables), np.nan)
+    else:
+        p_values = granger_min_pvalues(data.values, data["returns"].values, maxlag=4)
 
+    matrix = pd.DataFrame({"Influencer": [var + '_y' for var in variables],
+                           "p-value": p_values}).sort_values("p-value", ascending=True) 
     
-    score,pvalue,_=coint(df_coint["returns"],df_coint["sentiment"])
-
-    pvalue = pvalue
-
-
-    fig_corr_test = go.Figure(go.Indicator(
-    mode = "number",
-       # gauge = {'shape': "bullet"},
-    value = round(pvalue,6),
-    domain = {'x': [0.1, 1], 'y': [0.2, 0.9]},
-    number = {'valueformat':'.4f'},        
-    title = {'text': ""}))
-
-    fig_corr_test.update_layout(margin=dict(l=0, r=0, t=0, b=0),
-                          height=60,paper_bgcolor = "#fffafa")
-
-    fig_corr_test.update_traces(number_font_family="courier")
-
-    return fig_corr_test
-
-
-
-
-# Causality 2
-@app.callback(
-    Output(component_id='causality_plot_2', component_property='figure'),  
-    Input(component_id='tweets-dropdown', component_property='value'),
-    Input(component_id='my-LED-display-slider-2', component_property='value')    
+    matrix = matrix.iloc[0:1,1:2]["p-value"].values[0]
 
-)
+    return [statistic_indicator(round(df_corr_sentiment,6)),
+            statistic_indicator(round(pvalue,6)),
+            statistic_indicator(round(matrix,4))]
 
-def causality_2(selected_influencer, selected_year):
-    
-    
-    close = df[["Date","returns"]]
-    
-    sentiment = tweets_df[["Datetime", "sentiment", "Username"]].sort_values("Datetime")
-    sentiment["Datetime"] = pd.to_datetime(sentiment["Datetime"], format = '%Y/%m/%d').dt.tz_localize(None)
-    
-    sentiment["Datetime"]  = sentiment["Datetime"].dt.date
-    
-    sentiment["Datetime"] = pd.to_datetime(sentiment["Datetime"], format = '%Y/%m/%d')    
-    sentiment["month"]  = sentiment["Datetime"].dt.month
-    sentiment["year"]  = sentiment["Datetime"].dt.year
-    
-    
-    
-    sentiment=sentiment.groupby(["Datetime",  "year", "Username"], as_index=False)\
-    .mean().sort_values("Datetime")
 
-    sentiment = sentiment.set_index("Datetime")
-    close = close.set_index("Date")
-    sentiment = sentiment.interpolate()
-    close = close["2016-07-08": "2022-06-30"]
-    close = close.reset_index()
-    sentiment = sentiment.reset_index()
-    df_corr_sentiment  = pd.concat([sentiment, close], axis=1)
-    df_corr_sentiment = df_corr_sentiment[["Datetime",  "year", "sentiment", "Username", "returns"]]
-    df_corr_sentiment = df_corr_sentiment.set_index("Datetime")
-
-    df_final = df_corr_sentiment
-    
-    df_filtered = df_final[df_final["Username"] == selected_influencer]
-    
-    df_filtered_2 = df_filtered[                   
-                                (df_filtered["year"] == selected_year)]
-    
-    
-    
-    data = df_filtered_2[["returns", "sentiment"]]
-  
-    variables=data.columns  
-    matrix = pd.DataFrame(np.zeros((len(variables), len(variables))), columns=variables, index=variables)
-    for col in matrix.columns:
-        for row in matrix.index:
-            test_result = grangercausalitytests(data[[row, col]], maxlag=4, verbose=False)            
-            p_values = [round(test_result[i+1][0]['ssr_chi2test'][1],4) for i in range(4)]            
-            min_p_value = np.min(p_values)
-            matrix.loc[row, col] = min_p_value
-    matrix.columns = [var + '_x' for var in variables]
-    matrix.index = [var + '_y' for var in variables]
-    
-    matrix = matrix["returns_x"].to_frame()
-    matrix = matrix.reset_index()
-
-    matrix = matrix.rename(columns={ "index": "Influencer",
-                                     "returns_x": "p-value"}).sort_values("p-value", ascending=True) 
-    
-    matrix = matrix.iloc[0:1,1:2]["p-value"].values[0]
+# Statistic Indicator (/page-3)
+def statistic_indicator(value):
 
     fig_corr_test = go.Figure(go.Indicator(
     mode = "number",
        # gauge = {'shape': "bullet"},
-    value = round(matrix,4),
+    value = value,
     domain = {'x': [0.1, 1], 'y': [0.2, 0.9]},
     number = {'valueformat':'.4f'},        
     title = {'text': ""}))
@@ -2157,27 +2251,16 @@ def causality_2(selected_influencer, selected_year):
 
 def world_cloud(selected_influencer, selected_year):
     
-    df = tweets_df
-        
-    df = df[df["Username"] == selected_influencer]
+    # Term frequencies of the selected year(s)
+    frequencies = wordclouds.merge_frequencies(tweets_term_frequencies(), selected_influencer, selected_year)
 
-    df = df[
-           (df["year"] == selected_year)]
-    
-        
-    
-    df = df["Text"]
-    
-    df = df.astype(str)
+    key, png = wordclouds.render_png(frequencies, wordcloud_images, background_color='white')
 
-    my_wordcloud = WordCloud(
-        background_color='white',
-    ).generate(' '.join(df))
+    # PNG encoded once; the figure only points at it
+    source = WORDCLOUD_ROUTE + "/" + key + ".png" if IMAGE_TRANSPORT == "url" else images.data_uri(png)
 
-    fig_wordcloud = px.imshow(my_wordcloud, template='ggplot2')
-    fig_wordcloud.update_layout(margin=dict(l=0, r=0, t=0, b=0), height=300)
-    fig_wordcloud.update_xaxes(visible=False)
-    fig_wordcloud.update_yaxes(visible=False)
+    fig_wordcloud = images.image_figure(source, wordclouds.STYLE["width"], wordclouds.STYLE["height"])
+    fig_wordcloud.update_layout(template='ggplot2', margin=dict(l=0, r=0, t=0, b=0), height=300)
 
     return fig_wordcloud      
 
@@ -2191,12 +2274,12 @@ def world_cloud(selected_influencer, selected_year):
 
 )
 
+@callback_cache.memoize
 def barplot_poscos(selected_influencer, selected_year):
     
     colorscale = ["#c41e3a", "#0072bb"]
-    df = tweets_df
-        
-    df = df[df["Username"] == selected_influencer]
+    # Only the needed columns (copying the rows of the text column would touch every tweet)
+    df = tweets_df.loc[tweets_df["Username"] == selected_influencer, ["sentiment", "year"]]
 
     df = df[
            (df["year"] == selected_year)]
@@ -2230,43 +2313,37 @@ def barplot_poscos(selected_influencer, selected_year):
 # Positive & Negative Bar Plot
 @app.callback(
     Output(component_id='sentiment_trend_plot', component_property='figure'),  
-    Input(component_id='tweets-dropdown', component_property='value')       
+    Input(component_id='tweets-dropdown', component_property='value'),
+    Input(component_id='sentiment_trend_plot', component_property='relayoutData')
 
 )
+def sentiment_trend(selected_influencer, relayout_data):
+    window = chart_window(relayout_data)
+    if window is dash.no_update:
+        return dash.no_update
+    return sentiment_trend_figure(selected_influencer, window)
 
-def sentiment_trend(selected_influencer):
+@callback_cache.memoize
+def sentiment_trend_figure(selected_influencer, window):
     
-    df_close = df_melted.query("variable == 'returns'") 
-
-    cols_1 = ["value"]
-    corr_1_scaled = MinMaxScaler()
-    df_close[cols_1] = corr_1_scaled.fit_transform(df_close[cols_1])  
-    
-    df_close = df_close.set_index("Date")
+    df_close = derived.series("minmax", "returns").rename("value").to_frame()
     
     #df_close = df_close["2022-01-01":]
     
-    df = tweets_df[tweets_df["Username"] == selected_influencer]
-    
-    cols_2 = ["sentiment"]
-    corr_2_scaled = MinMaxScaler()
-    df[cols_2] = corr_2_scaled.fit_transform(df[cols_2])      
-    
-    df["Datetime"] = pd.to_datetime(df["Datetime"])
-    df = df.set_index("Datetime")
-    
-    df = df["2019-08-01":]
-    
-    trend = df["sentiment"].resample('D').mean().to_frame().reset_index()
+    # Daily mean of the influencer's scaled sentiment, on every day from the first tweet on
+    trend = scaled_sentiment_df[selected_influencer].dropna()["2019-08-01":].asfreq("D")
 
     fig = go.Figure()
     
-    fig.add_trace(go.Scatter(x=df_close.index, y=df_close.value, 
+    rows = downsample.resample(df_close.index, df_close.value.values, window, method="minmax")
+    fig.add_trace(downsample.scatter(len(rows))(x=df_close.index[rows], y=df_close.value.values[rows], 
                              name="Returns",
                              marker_color="#9c7c38")) 
     
-    fig.add_trace(go.Bar(x=df_close.index, 
-                         y=trend.sentiment, 
+    # Bars drawn on the day of the tweets they average
+    rows = downsample.resample(trend.index, trend.values, window, method="minmax")
+    fig.add_trace(go.Bar(x=trend.index.values[rows], 
+                         y=trend.values[rows], 
                          name=selected_influencer,
                          marker_color="#989898",
                          width=3))
@@ -2291,7 +2368,8 @@ def sentiment_trend(selected_influencer):
     fig.update_xaxes(showspikes=True)
     fig.update_yaxes(showspikes=True)    
 
-    fig.update_layout(template= 'gridon',  margin=dict(l=50, r=50, t=20, b=20), height=300)
+    fig.update_layout(template= 'gridon',  margin=dict(l=50, r=50, t=20, b=20), height=300,
+                      uirevision=selected_influencer)
     return fig     
 
 
@@ -2303,13 +2381,12 @@ def sentiment_trend(selected_influencer):
 )
 
 # Min Year Indicator
+@callback_cache.memoize
 def min_year(selected_influencer):
 
 
     
-    df = tweets_df.copy()
-    
-    df = df[df["Username"] == selected_influencer]
+    df = tweets_df.loc[tweets_df["Username"] == selected_influencer, ["Datetime"]]
     
     df["Datetime"] = pd.to_datetime(df["Datetime"])
         
@@ -2344,11 +2421,10 @@ def min_year(selected_influencer):
 
 )  
 # Max Year Indicator
-def min_year(selected_influencer):
+@callback_cache.memoize
+def max_year(selected_influencer):
 
-    df = tweets_df.copy()
-    
-    df = df[df["Username"] == selected_influencer]
+    df = tweets_df.loc[tweets_df["Username"] == selected_influencer, ["Datetime"]]
 
         
     df["Datetime"] = pd.to_datetime(df["Datetime"])
@@ -2381,4 +2457,5 @@ def min_year(selected_influencer):
 ############################################################## End ###################################################
 
 if __name__ == "__main__":
+    start_background_tasks()
     app.run_server(debug=False, port="8069")
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# ACF / PACF of many series at once.
+#
+# Every column of a (observations x series) array is handled in one batch:
+# the autocovariances of all columns come from a single FFT along the
+# observations, and the partial autocorrelations from a Durbin-Levinson
+# recursion over the lags, vectorised across the columns. Results and 95%
+# intervals are the ones of statsmodels' acf(x, alpha=0.05) and
+# pacf(x, alpha=0.05) (Bartlett intervals, Yule-Walker with the adjusted
+# autocovariances), without one call per series.
+
+import numpy as np
+
+
+# Two-sided 95% normal quantile (scipy.stats.norm.ppf(0.975))
+Z_95 = 1.959963984540054
+
+
+# statsmodels' default number of lags
+def default_nlags(nobs, partial=False):
+    return min(int(10 * np.log10(nobs)), nobs // 2 - 1 if partial else nobs - 1)
+
+
+# Sums of x[t] * x[t + k] of every column for k = 0..nlags (columns demeaned)
+def _lagged_products(values, nlags):
+    n = values.shape[0]
+    centred = values - values.mean(axis=0)
+    size = 1 << int(np.ceil(np.log2(2 * n - 1)))
+    spectrum = np.fft.rfft(centred, n=size, axis=0)
+    return np.fft.irfft(spectrum * np.conj(spectrum), n=size, axis=0)[:nlags + 1]
+
+
+# (acf, interval) per column, (nlags + 1) x columns: the ACF is within +-interval of 0 at 95%
+def acf(values, nlags):
+    values = np.asarray(values, dtype=np.float64)
+    products = _lagged_products(values, nlags)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ac = products / products[0]
+
+    # Bartlett's formula
+    n = values.shape[0]
+    var = np.ones_like(ac) / n
+    var[0] = 0
+    var[2:] *= 1 + 2 * np.cumsum(ac[1:-1] ** 2, axis=0)
+    return ac, Z_95 * np.sqrt(var)
+
+
+# (pacf, interval) per column, (nlags + 1) x columns
+def pacf(values, nlags):
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[0]
+    products = _lagged_products(values, nlags)
+
+    # Adjusted autocovariances (lag k divided by n - k, lag 0 by n)
+    r = products / np.concatenate([[n], n - np.arange(1, nlags + 1)])[:, None]
+
+    # Durbin-Levinson: the last AR coefficient of each Yule-Walker order
+    pc = np.zeros_like(r)
+    pc[0] = 1
+    phi = np.zeros((0, r.shape[1]))
+    error = r[0].copy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for k in range(1, nlags + 1):
+            reflection = (r[k] - (phi * r[k - 1:0:-1]).sum(axis=0)) / error
+            phi = np.vstack([phi - reflection * phi[::-1], reflection])
+            error = error * (1 - reflection ** 2)
+            pc[k] = reflection
+
+    interval = np.full_like(pc, Z_95 / np.sqrt(n))
+    interval[0] = 0
+    return pc, interval
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+# Offline build of the result store (results.sqlite).
+#
+# Precomputes the Granger causality and cointegration p-values for every
+# month-aligned window of the /page-1 date picker, and the stationarity
+# tests of every component. The cointegration and stationarity tests (one
+# statsmodels call per window and variable) run on STATS_N_JOBS processes
+# (see parallel.py). Run from src/:
+#
+#     python build_results.py [first last] [--jobs N]
+
+import sys
+
+import app
+import parallel
+from result_store import month_windows
+
+
+# Bounds of the /page-1 date picker
+FIRST_DATE = "2019-08-02"
+LAST_DATE = "2022-07-31"
+
+
+def build(first=FIRST_DATE, last=LAST_DATE, n_jobs=None):
+    windows = month_windows(first, last)
+    variables = [col for col in app.df.columns if col not in ("Date", "Close")]
+    panel = app.panel
+
+    # Granger causality: one vectorised batch per window
+    for start, end in windows:
+        app.close_causality_pvalues(start, end)
+    print("Granger causality: %d windows" % len(windows))
+
+    # Cointegration: every (window, variable) missing from the store, in parallel
+    tasks, pairs = [], []
+    for start, end in windows:
+        rows = panel.bounds(start, end)
+        stored = app.results.get_many("coint", variables, start, end, 0)
+        for variable in variables:
+            if variable not in stored:
+                # Same column order as the callback
+                first_col, second_col = sorted({"Close", variable})
+                tasks.append((start, end, variable))
+                pairs.append(((rows.start, rows.stop), panel.index[first_col], panel.index[second_col]))
+
+    pvalues = parallel.pairwise(parallel.coint_pvalue, panel.values, pairs, n_jobs=n_jobs, return_exceptions=True)
+
+    by_window = {}
+    for (start, end, variable), pvalue in zip(tasks, pvalues):
+        if isinstance(pvalue, Exception):
+            print("Skipped cointegration of %s for %s .. %s: %s" % (variable, start, end, pvalue),
+                  file=sys.stderr)
+            continue
+        by_window.setdefault((start, end), {})[variable] = pvalue
+
+    for (start, end), window_pvalues in by_window.items():
+        app.results.put_many("coint", window_pvalues, start, end, 0)
+    print("Cointegration: %d tests" % len(pairs))
+
+    # Stationarity: ADF / KPSS of every component over all the data
+    app.test_stationarity(n_jobs=n_jobs)
+    print("Stationarity: %d components" % len(panel.variables))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    n_jobs = None
+    if "--jobs" in args:
+        k = args.index("--jobs")
+        n_jobs = int(args[k + 1])
+        del args[k:k + 2]
+    build(*args[:2], n_jobs=n_jobs)
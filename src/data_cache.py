@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+# Binary columnar cache of the cleaned data.
+#
+# The cleaned components panel (dates + one float64 dates x variables
+# array) and the tweets table are written once as .npy files and opened
+# with np.load(mmap_mode="r") at startup, so gunicorn workers skip the CSV
+# parsing / cleaning and share the pages of the panel instead of each one
+# holding a private copy. Each build lives in cache/<source hash>/: when a
+# CSV changes its hash changes too and the cache is rebuilt from the CSVs.
+#
+# Build it ahead of time from src/ with:
+#
+#     python data_cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+CACHE_DIR = "cache"
+FORMAT_VERSION = 1
+
+
+# Content hash of the source files
+def source_hash(*paths):
+    digest = hashlib.sha256(str(FORMAT_VERSION).encode())
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+# Same cleaning steps as the original load of btc_components.csv
+def clean_components(raw):
+    df = raw.interpolate()
+    df = df.dropna()
+    df = df.drop(columns=["Volume.1", "Returns.1", "Returns"])
+    # Percent Change + Drop null values
+    df['returns'] = 100 * df.Close.pct_change().dropna()
+
+    # Apply log returns
+    df['log_returns'] = np.log(df.Close/df.Close.shift(1))
+
+    # Drop NA
+    return df.dropna()
+
+
+def read_tweets(path):
+    tweets_df = pd.read_csv(path)
+    tweets_df["Datetime"] = pd.to_datetime(tweets_df["Datetime"])
+    tweets_df["month"] = tweets_df["Datetime"].dt.month
+    tweets_df["year"] = tweets_df["Datetime"].dt.year
+    return tweets_df
+
+
+# Components DF (Date as "%Y-%m-%d" strings) on top of the panel arrays
+def components_frame(dates, values, variables):
+    df = pd.DataFrame(values, columns=list(variables), copy=False)
+    df.insert(0, "Date", pd.DatetimeIndex(dates).strftime("%Y-%m-%d"))
+    return df
+
+
+######################################################### Tables ##################################################
+
+# One .npy per column: numbers as they are, datetimes as int64 ns (UTC),
+# strings as a UTF-8 byte buffer plus offsets and a missing mask
+def write_table(frame, path):
+    columns = []
+    for i, col in enumerate(frame.columns):
+        s = frame[col]
+        name = os.path.join(path, "%d" % i)
+
+        if pd.api.types.is_datetime64_any_dtype(s):
+            tz = str(s.dt.tz) if s.dt.tz is not None else None
+            np.save(name + ".npy", s.to_numpy(dtype="datetime64[ns]").view(np.int64))
+            columns.append({"name": col, "kind": "datetime", "tz": tz})
+
+        elif pd.api.types.is_numeric_dtype(s):
+            np.save(name + ".npy", s.to_numpy())
+            columns.append({"name": col, "kind": "numeric"})
+
+        else:
+            missing = s.isna().to_numpy()
+            encoded = [b"" if m else str(v).encode("utf-8") for v, m in zip(s, missing)]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+            np.save(name + ".bytes.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+            np.save(name + ".offsets.npy", offsets)
+            np.save(name + ".missing.npy", missing)
+            columns.append({"name": col, "kind": "string"})
+
+    return columns
+
+
+# Object column of a string .npy triple; a repeated value (e.g. a username) is
+# decoded once and shared by its rows instead of being one small object per row
+def read_strings(name):
+    buffer = np.load(name + ".bytes.npy").tobytes()
+    offsets = np.load(name + ".offsets.npy")
+    missing = np.load(name + ".missing.npy")
+
+    decoded = {}
+    values = np.empty(len(missing), dtype=object)
+    for i, (a, b, m) in enumerate(zip(offsets[:-1].tolist(), offsets[1:].tolist(), missing.tolist())):
+        if m:
+            values[i] = np.nan
+        else:
+            raw = buffer[a:b]
+            value = decoded.get(raw)
+            if value is None:
+                value = decoded[raw] = raw.decode("utf-8")
+            values[i] = value
+    return pd.Series(values, dtype=object)
+
+
+def read_table(path, columns):
+    data = {}
+    for i, column in enumerate(columns):
+        name = os.path.join(path, "%d" % i)
+
+        if column["kind"] == "datetime":
+            values = np.load(name + ".npy", mmap_mode="r").view("datetime64[ns]")
+            values = pd.to_datetime(values, utc=column["tz"] is not None)
+            data[column["name"]] = values if column["tz"] is None else values.tz_convert(column["tz"])
+
+        elif column["kind"] == "numeric":
+            data[column["name"]] = np.load(name + ".npy", mmap_mode="r")
+
+        else:
+            data[column["name"]] = read_strings(name)
+
+    return pd.DataFrame(data)
+
+
+######################################################### Build / Load ############################################
+
+def build(btc_path, tweets_path, cache_dir=CACHE_DIR, version=None):
+    version = version or source_hash(btc_path, tweets_path)
+    target = os.path.join(cache_dir, version)
+
+    # Write into a private directory and rename it into place, so workers
+    # starting together never read a half written cache
+    tmp = "%s.tmp-%d" % (target, os.getpid())
+    os.makedirs(tmp, exist_ok=True)
+
+    df = clean_components(pd.read_csv(btc_path))
+    variables = [col for col in df.columns if col != "Date"]
+    np.save(os.path.join(tmp, "dates.npy"),
+            pd.to_datetime(df["Date"]).to_numpy(dtype="datetime64[ns]").view(np.int64))
+    np.save(os.path.join(tmp, "values.npy"),
+            np.ascontiguousarray(df[variables].to_numpy(dtype=np.float64)))
+
+    tweets_dir = os.path.join(tmp, "tweets")
+    os.makedirs(tweets_dir)
+    tweets_columns = write_table(read_tweets(tweets_path), tweets_dir)
+
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"format": FORMAT_VERSION, "source_hash": version,
+                   "variables": variables, "tweets": tweets_columns}, f)
+
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        # Another worker got there first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    # Drop caches of older sources
+    for name in os.listdir(cache_dir):
+        if name != version and ".tmp-" not in name:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+    return target
+
+
+# (dates, values, variables) of the panel and the tweets DF, memory-mapped from the cache
+def load(btc_path, tweets_path, cache_dir=CACHE_DIR):
+    version = source_hash(btc_path, tweets_path)
+    target = os.path.join(cache_dir, version)
+    if not os.path.exists(os.path.join(target, "meta.json")):
+        build(btc_path, tweets_path, cache_dir, version)
+
+    with open(os.path.join(target, "meta.json")) as f:
+        meta = json.load(f)
+
+    dates = np.load(os.path.join(target, "dates.npy"), mmap_mode="r").view("datetime64[ns]")
+    values = np.load(os.path.join(target, "values.npy"), mmap_mode="r")
+    tweets_df = read_table(os.path.join(target, "tweets"), meta["tweets"])
+
+    return (dates, values, meta["variables"]), tweets_df
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:3] or ["btc_components.csv", "tweets_sentiment.csv"]
+    print(build(*paths))
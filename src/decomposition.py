@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+# Seasonal decomposition of every component.
+#
+# Two modes:
+#
+# - classical: statsmodels' moving-average seasonal_decompose, one yearly
+#   (365 days) seasonal component, as the page always showed
+# - stl: one STL seasonal component per period (weekly, monthly, yearly),
+#   fitted in turn on the series less the other components and refined
+#   over a few passes (the MSTL procedure, which the pinned statsmodels
+#   does not ship yet). The loess smoothers are evaluated every tenth of
+#   their window and interpolated in between, as R's stl does by default:
+#   the yearly trend window spans ~1.5 years, which makes statsmodels'
+#   default of every point over ten times slower for a near-identical curve
+#
+# A decomposition is a frame of observed / trend / seasonal / resid (the
+# seasonal column is the sum of the periods, which are also kept as
+# seasonal_<period> columns). Components are decomposed in parallel on a
+# joblib process pool (STATS_N_JOBS, see parallel.py).
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+
+import parallel
+from lazy import lazy_import
+
+seasonal_decomposition = lazy_import("statsmodels.tsa.seasonal")
+
+
+MODES = {
+    "classical": (365,),
+    "stl": (7, 30, 365),
+}
+
+# Passes over the periods of the STL mode
+STL_ITERATIONS = 2
+
+
+def classical(series, period):
+    result = seasonal_decomposition.seasonal_decompose(
+                series, model='additive', filt=None, period=period,
+                two_sided=True, extrapolate_trend=0)
+    return pd.DataFrame({"observed": result.observed, "trend": result.trend,
+                         "seasonal": result.seasonal, "resid": result.resid,
+                         "seasonal_%d" % period: result.seasonal})
+
+
+# statsmodels' default trend / low-pass window lengths (next odd integer)
+def _odd(length):
+    length = int(np.ceil(length))
+    return length + (length % 2 == 0)
+
+
+def _jump(window):
+    return int(np.ceil(window / 10))
+
+
+def stl(series, periods):
+    # STL needs two full cycles of a period
+    periods = [period for period in sorted(periods) if 2 * period <= len(series)]
+    values = series.to_numpy(dtype=np.float64)
+    seasonals = np.zeros((len(periods), len(values)))
+    deseasoned = values.copy()
+    trend = None
+
+    for _ in range(STL_ITERATIONS):
+        for k, period in enumerate(periods):
+            deseasoned += seasonals[k]
+            # Seasonal smoother lengths as in MSTL: 7, 11, 15 ...
+            seasonal = 7 + 4 * k
+            trend_window, low_pass = _odd(1.5 * period / (1 - 1.5 / seasonal)), _odd(period)
+            result = seasonal_decomposition.STL(deseasoned, period=period, seasonal=seasonal,
+                                                seasonal_jump=_jump(seasonal), trend_jump=_jump(trend_window),
+                                                low_pass_jump=_jump(low_pass)).fit()
+            seasonals[k] = result.seasonal
+            trend = result.trend
+            deseasoned -= seasonals[k]
+
+    if trend is None:
+        trend = np.full(len(values), np.nan)
+    frame = pd.DataFrame({"observed": values, "trend": trend, "seasonal": seasonals.sum(axis=0),
+                          "resid": deseasoned - trend}, index=series.index)
+    for k, period in enumerate(periods):
+        frame["seasonal_%d" % period] = seasonals[k]
+    return frame
+
+
+def decompose(series, mode):
+    periods = MODES[mode]
+    return classical(series, periods[0]) if mode == "classical" else stl(series, periods)
+
+
+def _decompose_chunk(columns, mode):
+    return [decompose(series.dropna(), mode) for series in columns]
+
+
+# {column: decomposition} of every column of `frame` (the columns decomposed in parallel)
+def decompose_all(frame, mode, n_jobs=None):
+    columns = [frame[column] for column in frame.columns]
+    n_jobs = effective_n_jobs(parallel.N_JOBS if n_jobs is None else n_jobs)
+    if n_jobs == 1:
+        results = _decompose_chunk(columns, mode)
+    else:
+        chunks = [columns[k::n_jobs] for k in range(n_jobs)]
+        done = Parallel(n_jobs=n_jobs)(delayed(_decompose_chunk)(chunk, mode) for chunk in chunks)
+        results = [None] * len(columns)
+        for k, chunk in enumerate(done):
+            results[k::n_jobs] = chunk
+    return dict(zip(frame.columns, results))
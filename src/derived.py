@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+# Derived series of every component, computed once.
+#
+# Each transform is a Panel (see panel.py) of the same dates and variables:
+#
+# - pct_change: daily % change, 100 * pct_change() (gaps padded first, as pandas does)
+# - log_change: daily log change
+# - zscore: (value - mean) / std, as a StandardScaler fitted on the whole history
+# - minmax: scaled to [0, 1], as a MinMaxScaler fitted on the whole history
+#
+# The callbacks read columns / frames of these panels (views, no copy)
+# instead of refitting a scaler or recomputing a change per request.
+#
+# On append the changes of the new rows are appended to their panels, and
+# the column statistics (count, mean, sum of squared deviations, min,
+# max) are merged with those of the new rows. Both scaled panels then
+# depend on the new statistics for every row and are rebuilt in one
+# vectorised pass off the request path.
+
+import numpy as np
+
+from panel import Panel
+
+
+TRANSFORMS = ("pct_change", "log_change", "zscore", "minmax")
+
+
+# Last value (forward fill) of every column before each row, starting from `last`
+def _previous(values, last):
+    filled = np.vstack([last, values])
+    valid = np.isfinite(filled)
+    position = np.where(valid, np.arange(len(filled))[:, None], 0)
+    np.maximum.accumulate(position, axis=0, out=position)
+    filled = filled[position, np.arange(filled.shape[1])]
+    return filled[:-1], filled[-1], filled[1:]
+
+
+# (count, mean, sum of squared deviations, min, max) of every column, NaN ignored
+def _statistics(values):
+    valid = np.isfinite(values)
+    count = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(valid, values, 0).sum(axis=0) / count
+        squares = np.where(valid, (values - mean) ** 2, 0).sum(axis=0)
+    with np.errstate(invalid="ignore"):
+        low = np.where(count > 0, np.fmin.reduce(values, axis=0, initial=np.inf), np.nan)
+        high = np.where(count > 0, np.fmax.reduce(values, axis=0, initial=-np.inf), np.nan)
+    return count, mean, squares, low, high
+
+
+# Statistics of two row blocks combined (Chan et al.'s update of the mean and squared deviations)
+def _merge(a, b):
+    count_a, mean_a, squares_a, low_a, high_a = a
+    count_b, mean_b, squares_b, low_b, high_b = b
+    count = count_a + count_b
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta = np.where(count_b > 0, mean_b - mean_a, 0)
+        weight = np.where(count > 0, count_b / count, 0)
+        mean = np.where(count_a > 0, mean_a + delta * weight, mean_b)
+        squares = (np.where(count_a > 0, squares_a, 0) + np.where(count_b > 0, squares_b, 0)
+                   + delta ** 2 * count_a * weight)
+    return count, mean, squares, np.fmin(low_a, low_b), np.fmax(high_a, high_b)
+
+
+class DerivedSeries:
+
+    def __init__(self, panel):
+        self.panel = panel
+        self.variables = panel.variables
+        values = panel.values
+
+        first = np.full((1, len(self.variables)), np.nan)
+        previous, self.last, current = _previous(values, first)
+        self.transforms = {
+            "pct_change": Panel(panel.dates, self._pct_change(previous, current), self.variables),
+            "log_change": Panel(panel.dates, self._log_change(previous, current), self.variables),
+        }
+        self.statistics = _statistics(values)
+        self._rescale()
+
+    @staticmethod
+    def _pct_change(previous, current):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return 100 * (current / previous - 1)
+
+    @staticmethod
+    def _log_change(previous, current):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.log(current / previous)
+
+    # Rebuild the scaled panels from the statistics (a zero range / deviation scales by 1, as sklearn does)
+    def _rescale(self):
+        count, mean, squares, low, high = self.statistics
+        values = self.panel.values
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(squares / count)
+            std = np.where(std == 0, 1.0, std)
+            span = high - low
+            scale = 1.0 / np.where(span == 0, 1.0, span)
+            zscore = (values - mean) / std
+            minmax = values * scale - low * scale
+
+        self.transforms["zscore"] = Panel(self.panel.dates, zscore, self.variables)
+        self.transforms["minmax"] = Panel(self.panel.dates, minmax, self.variables)
+
+    # Rows just appended to the panel
+    def append(self, dates, values):
+        values = np.asarray(values, dtype=np.float64).reshape(len(dates), len(self.variables))
+        if not len(values):
+            return
+
+        previous, self.last, current = _previous(values, self.last)
+        self.transforms["pct_change"].append(dates, self._pct_change(previous, current))
+        self.transforms["log_change"].append(dates, self._log_change(previous, current))
+
+        self.statistics = _merge(self.statistics, _statistics(values))
+        self._rescale()
+
+    def __getitem__(self, transform):
+        return self.transforms[transform]
+
+    # Views of one transform, as Panel.column / series / frame
+    def column(self, transform, variable, start=None, end=None):
+        return self.transforms[transform].column(variable, start, end)
+
+    def series(self, transform, variable, start=None, end=None):
+        return self.transforms[transform].series(variable, start, end)
+
+    def frame(self, transform, start=None, end=None, variables=None):
+        return self.transforms[transform].frame(start, end, variables)
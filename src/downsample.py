@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+# Downsampling of long time series for the charts.
+#
+# A trace is capped at MAX_POINTS points (CHART_MAX_POINTS). Two pickers:
+#
+# - lttb: largest-triangle-three-buckets, for level series (prices,
+#   standardised values): one point per bucket, the one forming the
+#   largest triangle with the points kept around it, so the shape survives
+# - minmax: the lowest and highest point of every bucket, for returns and
+#   other spiky series: no spike is ever dropped
+#
+# When the user zooms (a relayoutData event of the graph: box zoom, range
+# slider, range selector buttons) the chart is redrawn with the budget
+# spent on the visible range, but for a coarse CONTEXT share on the rest
+# of the history, so the range slider keeps showing all of it.
+#
+# Traces still above WEBGL_POINTS (CHART_MAX_POINTS raised for intraday
+# data) are drawn with WebGL. Plotly leaves WebGL traces out of the range
+# slider preview, which is why the default cap keeps the charts on SVG.
+
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+
+MAX_POINTS = int(os.environ.get("CHART_MAX_POINTS", 2000))
+WEBGL_POINTS = 5000
+
+# Share of the budget kept for the history outside a zoomed range
+CONTEXT = 0.25
+
+
+# Indices of the n_out points kept by largest-triangle-three-buckets
+def lttb(x, y, n_out):
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x).astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # First and last points are kept; the others are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes
+
+    # Each bucket keeps the point making the largest triangle with the point kept
+    # before it and the mean of the next bucket
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        next_x, next_y = (mean_x[b + 1], mean_y[b + 1]) if b + 1 < n_out - 2 else (x[-1], y[-1])
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        kept[b + 1] = a
+    return kept
+
+
+# Indices of the lowest and highest point of n_out / 2 buckets (plus the first and last points)
+def minmax(y, n_out):
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    buckets = max(1, n_out // 2 - 1)
+    bucket = np.arange(n) * buckets // n
+    starts = np.searchsorted(bucket, np.arange(buckets))
+
+    # Sorted by bucket then value, the bucket starts are the minima / maxima (NaN never picked first)
+    lowest = np.lexsort((np.where(np.isnan(y), np.inf, y), bucket))[starts]
+    highest = np.lexsort((-np.where(np.isnan(y), -np.inf, y), bucket))[starts]
+    return np.unique(np.concatenate([[0, n - 1], lowest, highest]))
+
+
+def pick(x, y, n_out, method="lttb"):
+    if n_out <= 0:
+        return np.arange(0)
+    return lttb(x, y, n_out) if method == "lttb" else minmax(y, n_out)
+
+
+# Whether a relayoutData event moves the x axis (zoom, pan, range slider, autorange)
+def moves_x(relayout_data):
+    return bool(relayout_data) and any(key.startswith("xaxis.range") or key == "xaxis.autorange"
+                                       for key in relayout_data)
+
+
+# Visible x range ("YYYY-MM-DD", "YYYY-MM-DD") of a relayoutData event, widened to whole
+# days (None: the whole history)
+def visible_range(relayout_data):
+    if not relayout_data or relayout_data.get("xaxis.autorange"):
+        return None
+    if "xaxis.range" in relayout_data:
+        start, end = relayout_data["xaxis.range"]
+    elif "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        start, end = relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+    else:
+        return None
+    start, end = sorted(pd.to_datetime([start, end]))
+    return start.floor("D").strftime("%Y-%m-%d"), end.ceil("D").strftime("%Y-%m-%d")
+
+
+# Indices of the points of (dates, y) to draw: at most max_points, spent on the
+# `window` (start, end) when given and coarsely on the rest of the history
+def resample(dates, y, window=None, method="lttb", max_points=None):
+    max_points = max_points or MAX_POINTS
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    n = len(dates)
+    if n <= max_points:
+        return np.arange(n)
+    if window is None:
+        return pick(dates, y, max_points, method)
+
+    # One point beyond each edge, so that lines run to the borders of the view
+    lo = max(0, np.searchsorted(dates, np.datetime64(window[0]), "left") - 1)
+    hi = min(n, np.searchsorted(dates, np.datetime64(window[1]) + np.timedelta64(1, "D"), "left") + 1)
+
+    context = int(max_points * CONTEXT)
+    left = int(round(context * lo / max(1, lo + n - hi)))
+    return np.concatenate([
+        pick(dates[:lo], y[:lo], left, method),
+        lo + pick(dates[lo:hi], y[lo:hi], max_points - context, method),
+        hi + pick(dates[hi:], y[hi:], context - left, method),
+    ])
+
+
+# Scatter trace class for a trace of n points (WebGL above WEBGL_POINTS)
+def scatter(n):
+    return go.Scattergl if n > WEBGL_POINTS else go.Scatter
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# Batched Granger causality engine.
+#
+# Reproduces the ssr based chi2 test of statsmodels'
+# `grangercausalitytests` (with a constant) for many target series
+# against one causing series at once: for every lag the lagged design
+# matrices of all targets are stacked and the restricted / unrestricted
+# regressions are solved together with a batched SVD.
+
+import numpy as np
+
+from lazy import lazy_import
+
+stats = lazy_import("scipy.stats")
+
+
+# Residual sum of squares of y (k x n) regressed on X (k x n x m)
+def _batched_ssr(X, y):
+
+    # Column scaling leaves the column space (and so the residuals)
+    # unchanged but keeps the SVD well conditioned for series such as
+    # Difficulty or Volume that live on very different scales
+    scale = np.sqrt((X * X).sum(axis=1, keepdims=True))
+    scale[scale == 0] = 1.0
+    u, s, _ = np.linalg.svd(X / scale, full_matrices=False)
+
+    # Same rank cut-off as numpy's lstsq
+    tol = s.max(axis=-1, keepdims=True) * max(X.shape[1:]) * np.finfo(float).eps
+    u = u * (s > tol)[:, None, :]
+
+    fitted = np.einsum("knm,km->kn", u, np.einsum("knm,kn->km", u, y))
+    resid = y - fitted
+    return (resid * resid).sum(axis=1)
+
+
+# p-values (targets x lags) of the ssr chi2 test for "cause Granger-causes target"
+def granger_pvalues(targets, cause, maxlag=4):
+
+    targets = np.asarray(targets, dtype=float)
+    if targets.ndim == 1:
+        targets = targets[:, None]
+    cause = np.asarray(cause, dtype=float)
+
+    if not (np.isfinite(targets).all() and np.isfinite(cause).all()):
+        raise ValueError("x contains NaN or inf values.")
+
+    T, k = targets.shape
+    if T <= 3 * maxlag + 1:
+        raise ValueError(
+            "Insufficient observations. Maximum allowable "
+            "lag is {0}".format(int((T - 1) / 3) - 1))
+
+    pvalues = np.empty((k, maxlag))
+    infeasible = np.zeros(k, dtype=bool)
+
+    for lag in range(1, maxlag + 1):
+        n = T - lag
+        y = targets[lag:].T
+
+        # Lags 1..lag of the targets (k x n x lag) and of the cause (n x lag)
+        own = np.stack([targets[lag - j:T - j] for j in range(1, lag + 1)], axis=-1)
+        own = own.transpose(1, 0, 2)
+        lagged_cause = np.stack([cause[lag - j:T - j] for j in range(1, lag + 1)], axis=-1)
+        const = np.ones((k, n, 1))
+
+        restricted = np.concatenate([own, const], axis=-1)
+        joint = np.concatenate(
+            [own, np.broadcast_to(lagged_cause, (k, n, lag)), const], axis=-1)
+
+        ssr_restricted = _batched_ssr(restricted, y)
+        ssr_joint = _batched_ssr(joint, y)
+
+        # statsmodels refuses the test when a lagged column is constant
+        # or the unrestricted model fits perfectly
+        constant_cols = (joint.max(axis=1) == joint.min(axis=1)).sum(axis=1)
+        tss = ((y - y.mean(axis=1, keepdims=True)) ** 2).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            infeasible |= (constant_cols != 1) | (tss == 0) | (ssr_joint == 0) \
+                | (ssr_joint / tss < np.finfo(float).eps)
+
+            stat = n * (ssr_restricted - ssr_joint) / ssr_joint
+        pvalues[:, lag - 1] = stats.chi2.sf(stat, lag)
+
+    pvalues[infeasible] = np.nan
+    return pvalues
+
+
+# Minimum p-value over lags 1..maxlag, rounded to 4 decimals per lag as the callbacks show it
+def granger_min_pvalues(targets, cause, maxlag=4):
+    return np.round(granger_pvalues(targets, cause, maxlag), 4).min(axis=1)
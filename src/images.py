@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+# Image transport for raster figures.
+#
+# Instead of handing a pixel array to px.imshow (re-encoded and serialised
+# into every callback response), a raster is encoded to PNG once and the
+# figure only carries a layout image pointing at it: either a cached static
+# URL served with an ETag ("url") or an inline data URI ("inline").
+
+import base64
+import re
+
+import plotly.graph_objs as go
+
+
+KEY_PATTERN = re.compile(r"[0-9a-f]{40}")
+
+
+def data_uri(png):
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+# Figure showing the image `source` (URL or data URI) of width x height pixels
+def image_figure(source, width, height):
+    fig = go.Figure()
+    fig.add_layout_image(dict(
+        source=source,
+        xref="x", yref="y",
+        x=0, y=height,
+        sizex=width, sizey=height,
+        sizing="stretch",
+        layer="below"))
+
+    fig.update_xaxes(visible=False, range=[0, width], showgrid=False, zeroline=False)
+    fig.update_yaxes(visible=False, range=[0, height], showgrid=False, zeroline=False,
+                     scaleanchor="x", constrain="domain")
+    return fig
+
+
+# Serve the PNGs of an ImageCache under `prefix`/<key>.png. Keys are content
+# hashes, so responses are immutable and revalidate with the key as ETag
+def register_route(server, prefix, cache, max_age=7 * 24 * 3600):
+    from flask import abort, make_response, request
+
+    def serve(key):
+        if not KEY_PATTERN.fullmatch(key):
+            abort(404)
+        if key in request.if_none_match:
+            response = make_response("", 304)
+        else:
+            png = cache.get_png(key)
+            if png is None:
+                abort(404)
+            response = make_response(png)
+            response.mimetype = "image/png"
+
+        response.set_etag(key)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        return response
+
+    server.add_url_rule(prefix + "/<key>.png", endpoint="image_" + prefix.strip("/").replace("/", "_"),
+                        view_func=serve)
+    return prefix
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+# Incremental daily data ingestion.
+#
+# New daily rows come from a source (any object with a `fetch(after)`
+# method returning raw rows in the btc_components.csv layout). Only the
+# new tail is cleaned - interpolation, returns and log returns are seeded
+# with the last clean row - and the cleaned tail is handed to the
+# subscribed listeners, which append it to the derived structures
+# (panel, melted DF, summary cube, result store ...) instead of reloading
+# everything. The new data version (Ingestor.version) is only published
+# once every listener has returned, so nothing keyed by the version (the
+# callback cache, the result store) can pair it with the data before.
+
+import hashlib
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+# Columns of the raw CSV that the cleaning drops
+DROPPED_COLUMNS = ["Volume.1", "Returns.1", "Returns"]
+
+
+########################################################## Sources #################################################
+
+# Rows of a local drop file (same layout as btc_components.csv)
+class DropFileSource:
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+
+    def fetch(self, after):
+        if not os.path.exists(self.path):
+            return pd.DataFrame()
+
+        # Nothing to do while the file is unchanged
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return pd.DataFrame()
+        self._mtime = mtime
+
+        raw = pd.read_csv(self.path)
+        return raw[pd.to_datetime(raw["Date"]) > pd.Timestamp(after)]
+
+
+# Rows of an in-memory DF, e.g. a stub source for tests
+class FrameSource:
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    def fetch(self, after):
+        return self.frame[pd.to_datetime(self.frame["Date"]) > pd.Timestamp(after)]
+
+
+# Daily BTC prices from Yahoo Finance; the remaining components are
+# carried forward by the interpolation until a drop file provides them
+class YahooSource:
+
+    def __init__(self, ticker="BTC-USD"):
+        self.ticker = ticker
+
+    def fetch(self, after):
+        import yfinance as yf
+
+        start = (pd.Timestamp(after) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+        prices = yf.download(self.ticker, start=start, progress=False)
+        if prices.empty:
+            return pd.DataFrame()
+
+        prices = prices[["Open", "High", "Low", "Close", "Volume"]].reset_index()
+        prices["Date"] = prices["Date"].dt.strftime("%Y-%m-%d")
+        return prices[pd.to_datetime(prices["Date"]) > pd.Timestamp(after)]
+
+
+########################################################## Cleaning ################################################
+
+# Clean the raw rows after `last_row` (the last clean row: Date + variables)
+def clean_tail(last_row, raw):
+    columns = list(last_row.index)
+    if raw is None or raw.empty:
+        return pd.DataFrame(columns=columns)
+
+    raw = raw.drop(columns=[col for col in DROPPED_COLUMNS if col in raw.columns])
+    raw = raw.assign(Date=pd.to_datetime(raw["Date"]))
+    raw = raw[raw["Date"] > pd.Timestamp(last_row["Date"])].sort_values("Date")
+    if raw.empty:
+        return pd.DataFrame(columns=columns)
+
+    # Interpolate from the last clean row on; columns missing from the
+    # source are carried forward
+    numeric = [col for col in columns if col not in ("Date", "returns", "log_returns")]
+    block = pd.concat([last_row[numeric].to_frame().T, raw.reindex(columns=numeric)],
+                      ignore_index=True).astype(float).interpolate()
+
+    # Percent Change + Log Returns
+    block['returns'] = 100 * block.Close.pct_change()
+    block['log_returns'] = np.log(block.Close/block.Close.shift(1))
+
+    block.insert(0, "Date", [pd.Timestamp(last_row["Date"])] + list(raw["Date"]))
+    block["Date"] = block["Date"].dt.strftime("%Y-%m-%d")
+
+    return block.iloc[1:][columns].dropna().reset_index(drop=True)
+
+
+# Data version after appending `tail`; folded row by row so that the
+# version does not depend on how the rows were split into appends
+def chain_hash(version, tail):
+    for row_hash in pd.util.hash_pandas_object(tail, index=False).values:
+        version = hashlib.sha256((version + "%016x" % row_hash).encode()).hexdigest()
+    return version
+
+
+########################################################## Ingestor ################################################
+
+class Ingestor:
+
+    def __init__(self, last_row, version):
+        self.last_row = last_row
+        self.version = version
+        self.listeners = []
+        self.publish_listeners = []
+        self.lock = threading.Lock()
+
+    # Register fn(tail, version), called with every cleaned tail and the data version
+    # it leads to, before that version is published (usable as a decorator)
+    def subscribe(self, fn):
+        self.listeners.append(fn)
+        return fn
+
+    # Register fn(version), called once a new version is published (usable as a decorator)
+    def on_publish(self, fn):
+        self.publish_listeners.append(fn)
+        return fn
+
+    # Fetch, clean and append the rows of `source` newer than the last one;
+    # returns the number of rows added
+    def ingest(self, source):
+        with self.lock:
+            tail = clean_tail(self.last_row, source.fetch(self.last_row["Date"]))
+            if tail.empty:
+                return 0
+
+            version = chain_hash(self.version, tail)
+            for fn in self.listeners:
+                fn(tail, version)
+            self.last_row = tail.iloc[-1]
+            self.version = version
+
+            for fn in self.publish_listeners:
+                fn(version)
+
+            logger.info("Ingested %d rows up to %s", len(tail), self.last_row["Date"])
+            return len(tail)
+
+    # Poll `source` every `interval` seconds on a daemon thread
+    def start_polling(self, source, interval):
+
+        # First ingestion straight away: a worker forked from a master loaded long
+        # before (a recycled gunicorn worker) catches up with its siblings
+        def poll():
+            while True:
+                try:
+                    self.ingest(source)
+                except Exception:
+                    logger.exception("Ingestion from %r failed", source)
+                if stop.wait(interval):
+                    return
+
+        stop = threading.Event()
+        threading.Thread(target=poll, name="ingest", daemon=True).start()
+        return stop
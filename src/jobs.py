@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+# Background jobs on a SQLite queue.
+#
+# Long statistical computations (e.g. the Granger causality table of a
+# date window) run as jobs instead of inside the request. A job is keyed
+# by its kind, parameters and data version, so submitting the same window
+# again (another user, another worker, a page reload) returns the job
+# already queued / running / done instead of starting a second one.
+#
+# Runner threads (one per gunicorn worker, see app.start_background_tasks,
+# or a separate process: `python jobs.py`) claim queued jobs, report their
+# progress (done / total) and store the result; the page polls the status.
+# A runner only claims the jobs of its own data version (the workers ingest
+# new rows on their own schedule): a job of another version is left to the
+# runners on that version, and dropped with the finished jobs once old.
+# A job whose runner died (no progress for `stale_after` seconds) is
+# claimed again.
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("queued", "running", "done", "failed")
+
+
+class JobQueue:
+
+    # version() -> the data version of the submitting / running process
+    def __init__(self, path, version, stale_after=300, keep=24 * 3600):
+        self.path = path
+        self.version = version
+        self.stale_after = stale_after
+        self.keep = keep
+        self.tasks = {}
+
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT, params TEXT, status TEXT,"
+                " done INTEGER, total INTEGER, result TEXT, error TEXT, owner TEXT,"
+                " created REAL, updated REAL)")
+            # Queue files created before the jobs were tied to a data version
+            if "version" not in [row[1] for row in con.execute("PRAGMA table_info(jobs)")]:
+                con.execute("ALTER TABLE jobs ADD COLUMN version TEXT")
+            con.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+
+    # One short-lived connection per operation so that threads and
+    # gunicorn workers can share the file
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    # Register fn(params, progress) -> result (JSON) as the task of `kind`
+    # (usable as a decorator); progress(done, total) reports how far it is
+    def task(self, kind):
+        def register(fn):
+            self.tasks[kind] = fn
+            return fn
+        return register
+
+    @staticmethod
+    def job_id(kind, params, version):
+        payload = json.dumps([kind, sorted(params.items()), version], default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    # Queue a job on the current data version (or find the one already submitted)
+    # and return its status; with `retry` a failed job is queued again
+    def submit(self, kind, params, retry=True):
+        if kind not in self.tasks:
+            raise KeyError("Unknown job kind %r" % kind)
+
+        version = self.version()
+        job_id = self.job_id(kind, params, version)
+        now = time.time()
+        with self._connect() as con:
+            # Finished jobs, and queued ones no runner on their version took
+            con.execute("DELETE FROM jobs WHERE status != 'running' AND updated < ?", (now - self.keep,))
+            con.execute("INSERT OR IGNORE INTO jobs (id, kind, params, status, done, total, created, updated, version)"
+                        " VALUES (?, ?, ?, 'queued', 0, 0, ?, ?, ?)",
+                        (job_id, kind, json.dumps(params), now, now, version))
+            if retry:
+                con.execute("UPDATE jobs SET status = 'queued', error = NULL, done = 0, updated = ?"
+                            " WHERE id = ? AND status = 'failed'", (now, job_id))
+        return self.status(job_id)
+
+    # {id, kind, status, done, total, result, error} of a job (None if unknown)
+    def status(self, job_id):
+        with self._connect() as con:
+            row = con.execute("SELECT id, kind, status, done, total, result, error FROM jobs WHERE id = ?",
+                              (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("id", "kind", "status", "done", "total", "result", "error"), row))
+        job["result"] = None if job["result"] is None else json.loads(job["result"])
+        return job
+
+    # Take the oldest queued (or stale running) job of the current data version:
+    # (id, kind, params) or None
+    def claim(self, owner):
+        now = time.time()
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT id, kind, params FROM jobs"
+                " WHERE version = ? AND (status = 'queued' OR (status = 'running' AND updated < ?))"
+                " ORDER BY created LIMIT 1", (self.version(), now - self.stale_after)).fetchone()
+            if row is None:
+                return None
+
+            # Another runner may have taken it in between
+            claimed = con.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, updated = ?"
+                " WHERE id = ? AND (status = 'queued' OR (status = 'running' AND updated < ?))",
+                (owner, now, row[0], now - self.stale_after)).rowcount
+        return (row[0], row[1], json.loads(row[2])) if claimed else None
+
+    def progress(self, job_id, done, total):
+        with self._connect() as con:
+            con.execute("UPDATE jobs SET done = ?, total = ?, updated = ? WHERE id = ?",
+                        (int(done), int(total), time.time(), job_id))
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._connect() as con:
+            con.execute("UPDATE jobs SET status = ?, result = ?, error = ?, updated = ? WHERE id = ?",
+                        (status, None if result is None else json.dumps(result), error, time.time(), job_id))
+
+    # Claim and run one job; returns False when the queue is empty
+    def run_one(self, owner):
+        job = self.claim(owner)
+        if job is None:
+            return False
+
+        job_id, kind, params = job
+        try:
+            result = self.tasks[kind](params, lambda done, total: self.progress(job_id, done, total))
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            self._finish(job_id, "failed", error="%s: %s" % (type(e).__name__, e))
+        else:
+            self._finish(job_id, "done", result=result)
+        return True
+
+    # Run jobs on a daemon thread until the returned Event is set. The thread
+    # runs at a lower priority (Linux) so that jobs yield to the callbacks
+    def start_runner(self, interval=0.5, nice=10):
+
+        def run():
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+            except (AttributeError, OSError):
+                pass
+
+            owner = "%d:%s" % (os.getpid(), threading.current_thread().name)
+            while not stop.is_set():
+                try:
+                    if not self.run_one(owner):
+                        stop.wait(interval)
+                except Exception:
+                    logger.exception("Job runner failed")
+                    stop.wait(interval)
+
+        stop = threading.Event()
+        threading.Thread(target=run, name="jobs", daemon=True).start()
+        return stop
+
+    def run_forever(self, interval=0.5):
+        owner = "%d:main" % os.getpid()
+        while True:
+            if not self.run_one(owner):
+                time.sleep(interval)
+
+
+if __name__ == "__main__":
+    # Standalone runner next to web workers started with JOB_RUNNERS=0
+    import app
+
+    app.start_background_tasks(job_runners=0)
+    app.job_queue.run_forever()
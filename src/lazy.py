@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+# Deferred imports of the heavy analytics libraries.
+#
+# statsmodels, the figure factory and wordcloud (which pulls in
+# matplotlib) are each needed by a page or two only. A module imported
+# with lazy_import is loaded on its first attribute access, i.e. by the
+# first callback using it, instead of when a worker boots:
+#
+#     stattools = lazy_import("statsmodels.tsa.stattools")
+#     ...
+#     result = stattools.adfuller(value)    # imported here
+
+import importlib
+
+
+# Every lazy module created so far
+MODULES = []
+
+
+# Imported on first attribute access
+class LazyModule:
+
+    def __init__(self, name):
+        self.__dict__["name"] = name
+        self.__dict__["module"] = None
+
+    # Import now (e.g. in a preloading gunicorn master, see gunicorn.conf.py)
+    def load(self):
+        module = self.__dict__["module"]
+        if module is None:
+            module = importlib.import_module(self.__dict__["name"])
+            self.__dict__["module"] = module
+        return module
+
+    @property
+    def loaded(self):
+        return self.__dict__["module"] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        return "<lazy module %r (%s)>" % (self.__dict__["name"], "loaded" if self.loaded else "not loaded")
+
+
+def lazy_import(name):
+    module = LazyModule(name)
+    MODULES.append(module)
+    return module
+
+
+# Import every lazy module now
+def load_all():
+    for module in MODULES:
+        module.load()
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+# Two-tier memoization of the callbacks.
+#
+# The callbacks are pure functions of their inputs over the loaded data,
+# so their results (figures, p-values ...) are kept under a key built from
+# the function, its arguments, the data version and the code version:
+#
+#     tier 1   in-process LRU (bounded number of items, TTL)
+#     tier 2   SQLite file shared by all gunicorn workers (bounded bytes, TTL)
+#
+# A tier 2 hit is promoted to tier 1. Appended data changes the data
+# version and a redeploy the code version (a hash of every source file, as
+# a callback's result also depends on the helpers it calls), so results
+# computed before are never served again and age out of both tiers.
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+
+logger = logging.getLogger(__name__)
+
+
+# Bounded LRU of (created, value) with a TTL
+class MemoryTier:
+
+    def __init__(self, max_items=256, ttl=None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    # (found, value)
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return False, None
+            created, value = item
+            if self.ttl is not None and time.time() - created > self.ttl:
+                del self.items[key]
+                return False, None
+            self.items.move_to_end(key)
+            return True, value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = (time.time(), value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+
+# Pickled values in a SQLite file, bounded in total bytes, least recently used evicted first
+class DiskTier:
+
+    def __init__(self, path, max_bytes=256 * 2**20, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value BLOB, size INTEGER, created REAL, accessed REAL)")
+            con.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    # One short-lived connection per operation so that threads and
+    # gunicorn workers can share the file
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def __len__(self):
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def size(self):
+        with self._connect() as con:
+            return con.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    # (found, value)
+    def get(self, key):
+        now = time.time()
+        with self._connect() as con:
+            row = con.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False, None
+            if self.ttl is not None and now - row[1] > self.ttl:
+                con.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return False, None
+            con.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return True, pickle.loads(row[0])
+
+    def put(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with self._connect() as con:
+            con.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                        (key, sqlite3.Binary(blob), len(blob), now, now))
+            self._evict(con, now)
+
+    def _evict(self, con, now):
+        if self.ttl is not None:
+            con.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+        if con.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0] <= self.max_bytes:
+            return
+
+        # Keep the most recently used entries that fit
+        total, stale = 0, []
+        for key, size in con.execute("SELECT key, size FROM entries ORDER BY accessed DESC").fetchall():
+            total += size
+            if total > self.max_bytes:
+                stale.append((key,))
+        con.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+
+# Hash of the Python sources of a directory (the deployed code), stable across processes
+def source_version(directory):
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            digest.update(name.encode("utf-8"))
+            with open(os.path.join(directory, name), "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+class CallbackCache:
+
+    # `version` returns the current data version (e.g. lambda: ingestor.version),
+    # `code_version` identifies the deployed code (e.g. source_version of src/)
+    def __init__(self, path, version, code_version="", max_items=256, max_bytes=256 * 2**20, ttl=24 * 3600):
+        self.version = version
+        self.code_version = code_version
+        self.memory = MemoryTier(max_items, ttl)
+        self.disk = DiskTier(path, max_bytes, ttl) if path else None
+        self.names = set()
+        self.counts = dict(memory_hits=0, disk_hits=0, misses=0, disk_errors=0)
+        self.lock = threading.Lock()
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    # Decorator caching fn(*args) per (fn, args, data version, code version)
+    def memoize(self, fn):
+        name = "%s.%s" % (fn.__module__, fn.__qualname__)
+        if name in self.names:
+            raise ValueError("%s is memoized twice, the cache keys would collide" % name)
+        self.names.add(name)
+
+        @wraps(fn)
+        def cached(*args, **kwargs):
+            key = self.key(name, args, kwargs)
+
+            found, value = self.memory.get(key)
+            if found:
+                self._count("memory_hits")
+                return value
+
+            if self.disk is not None:
+                found, value = self._disk("get", key)
+                if found:
+                    self._count("disk_hits")
+                    self.memory.put(key, value)
+                    return value
+
+            self._count("misses")
+            value = fn(*args, **kwargs)
+            self.memory.put(key, value)
+            if self.disk is not None:
+                self._disk("put", key, value)
+            return value
+
+        return cached
+
+    def key(self, name, args, kwargs):
+        payload = json.dumps([name, self.code_version, self.version(), args, sorted(kwargs.items())], default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    # The shared file is only an accelerator: errors (locked, full disk,
+    # unpicklable values ...) fall back to computing
+    def _disk(self, method, *args):
+        try:
+            return getattr(self.disk, method)(*args)
+        except Exception:
+            self._count("disk_errors")
+            logger.exception("Callback cache %s failed", method)
+            return False, None
+
+    # Hit / miss counters of this process and the size of both tiers
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+        calls = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (calls - stats["misses"]) / calls if calls else None
+        stats["memory_items"] = len(self.memory)
+        if self.disk is not None:
+            stats["disk_items"] = len(self.disk)
+            stats["disk_bytes"] = self.disk.size()
+        return stats
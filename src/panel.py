@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# Wide, array-backed time-series panel.
+#
+# One contiguous float64 array of dates x variables plus a name -> column
+# index. Date windows are found with a binary search on the sorted dates
+# and returned as views of the array, so a callback only pays for the
+# window it asks for instead of scanning the long (melted) table.
+
+import numpy as np
+import pandas as pd
+
+
+class Panel:
+
+    def __init__(self, dates, values, variables):
+        self.dates = np.asarray(pd.to_datetime(dates), dtype="datetime64[ns]")
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.variables = list(variables)
+        self.index = {name: i for i, name in enumerate(self.variables)}
+
+        # Backing buffers; `dates` / `values` are views of their first len(self) rows
+        self._dates = self.dates
+        self._values = self.values
+
+    @classmethod
+    def from_frame(cls, frame, date_col="Date"):
+        variables = [col for col in frame.columns if col != date_col]
+        return cls(frame[date_col], frame[variables].to_numpy(dtype=np.float64), variables)
+
+    def __len__(self):
+        return len(self.dates)
+
+    # Append rows (dates after the last one). The buffers grow geometrically,
+    # so appends are amortised O(rows added); views handed out earlier stay valid
+    def append(self, dates, values):
+        dates = np.asarray(pd.to_datetime(dates), dtype="datetime64[ns]")
+        values = np.asarray(values, dtype=np.float64).reshape(len(dates), len(self.variables))
+        n, m = len(self), len(dates)
+        if not m:
+            return
+
+        if n + m > len(self._dates) or not (self._dates.flags.writeable and self._values.flags.writeable):
+            capacity = max(2 * len(self._dates), n + m)
+            buffer_dates = np.empty(capacity, dtype="datetime64[ns]")
+            buffer_values = np.empty((capacity, len(self.variables)))
+            buffer_dates[:n] = self.dates
+            buffer_values[:n] = self.values
+            self._dates, self._values = buffer_dates, buffer_values
+
+        self._dates[n:n + m] = dates
+        self._values[n:n + m] = values
+
+        # Values first: a reader slicing with the old dates still gets consistent rows
+        self.values = self._values[:n + m]
+        self.dates = self._dates[:n + m]
+
+    # Row slice of the dates in [start, end] (both inclusive, like Series.between)
+    def bounds(self, start=None, end=None):
+        lo = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start)), "left")
+        hi = len(self.dates) if end is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end)), "right")
+        return slice(lo, hi)
+
+    def date_index(self, start=None, end=None):
+        return pd.DatetimeIndex(self.dates[self.bounds(start, end)])
+
+    # View of one variable over the window
+    def column(self, variable, start=None, end=None):
+        return self.values[self.bounds(start, end), self.index[variable]]
+
+    def series(self, variable, start=None, end=None):
+        rows = self.bounds(start, end)
+        return pd.Series(self.values[rows, self.index[variable]],
+                         index=pd.DatetimeIndex(self.dates[rows], name="Date"), name=variable)
+
+    # DF over the window; a view of the panel when all variables are selected
+    def frame(self, start=None, end=None, variables=None):
+        rows = self.bounds(start, end)
+        if variables is None:
+            values, variables = self.values[rows], self.variables
+        else:
+            values = self.values[rows][:, [self.index[v] for v in variables]]
+        return pd.DataFrame(values, index=pd.DatetimeIndex(self.dates[rows], name="Date"),
+                            columns=list(variables), copy=False)
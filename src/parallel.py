@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+# Parallel execution of independent pairwise tests.
+#
+# A pair is (rows, i, j): the test runs on columns i and j of a shared
+# (dates x variables) array, restricted to the row range rows = (lo, hi).
+# Pairs are split into chunks and run on a joblib process pool: the array
+# is shipped once per call as a memory map (np.memmap arrays, e.g. the data
+# cache, by file name; others dumped once to joblib's shared memory
+# folder), not pickled per chunk. Results come back in the order of the pairs.
+#
+# The worker count defaults to STATS_N_JOBS (1: run in-process, -1: every
+# core). Keep it at 1 in the web workers, which already share the cores.
+
+import math
+import os
+
+from joblib import Parallel, delayed, effective_n_jobs
+
+from lazy import lazy_import
+
+stattools = lazy_import("statsmodels.tsa.stattools")
+
+
+N_JOBS = int(os.environ.get("STATS_N_JOBS", 1))
+
+
+########################################################## Tests ###################################################
+
+# Engle-Granger cointegration p-value of x and y
+def coint_pvalue(x, y):
+    return stattools.coint(x, y)[1]
+
+
+######################################################## Executor ##################################################
+
+def _run_chunk(test, values, chunk, return_exceptions):
+    results = []
+    for (lo, hi), i, j in chunk:
+        try:
+            results.append(test(values[lo:hi, i], values[lo:hi, j]))
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            results.append(e)
+    return results
+
+
+# [test(values[rows, i], values[rows, j]) for (rows, i, j) in pairs], in order. With
+# `return_exceptions` a failing pair gives its exception instead of stopping the run
+def pairwise(test, values, pairs, n_jobs=None, chunk_size=None, return_exceptions=False):
+    pairs = [((int(rows[0]), int(rows[1])), int(i), int(j)) for rows, i, j in pairs]
+    n_jobs = effective_n_jobs(N_JOBS if n_jobs is None else n_jobs)
+    if n_jobs == 1 or len(pairs) < 2:
+        return _run_chunk(test, values, pairs, return_exceptions)
+
+    # A few chunks per process: big enough to amortise the dispatch, small enough to balance
+    chunk_size = chunk_size or max(1, math.ceil(len(pairs) / (4 * n_jobs)))
+    chunks = [pairs[k:k + chunk_size] for k in range(0, len(pairs), chunk_size)]
+
+    # max_nbytes=0: the array always goes to the processes as a read-only memory map
+    results = Parallel(n_jobs=n_jobs, max_nbytes=0, mmap_mode="r")(
+        delayed(_run_chunk)(test, values, chunk, return_exceptions) for chunk in chunks)
+    return [result for chunk in results for result in chunk]
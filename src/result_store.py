@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+# On-disk store for statistical test results keyed by date window.
+#
+# p-values are kept in a SQLite file next to btc_components.csv, one row
+# per (data version, test, variable, start, end, maxlag), the version being
+# the content hash of the cleaned data. The gunicorn workers share the file
+# but ingest new rows on their own schedule: each one only reads and writes
+# the rows of its own version. When rows are appended, the results of the
+# windows ending before them are carried over to the new version and the
+# versions before the previous one are dropped. Month-aligned windows are
+# filled by the offline build command (build_results.py); any other window
+# is filled lazily by the callbacks. The parameters of the fitted volatility
+# models (volatility.py) are kept the same way, one row per (data version,
+# variable, model, start, end).
+
+import hashlib
+import json
+import sqlite3
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+
+# Content hash of a (cleaned) data frame
+def data_hash(frame):
+    hashed = pd.util.hash_pandas_object(frame, index=False).values
+    return hashlib.sha256(hashed.tobytes()).hexdigest()
+
+
+# Normalise the date picker values into the window key
+def window_key(start_date, end_date):
+    start, end = pd.to_datetime([start_date, end_date])
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
+# Month-aligned windows (first day of a month .. last day of a month) within [first, last]
+def month_windows(first, last):
+    first, last = pd.Timestamp(first), pd.Timestamp(last)
+    starts = [max(first, m) for m in pd.date_range(first.replace(day=1), last, freq="MS")]
+    ends = [min(last, m) for m in pd.date_range(first, last + pd.offsets.MonthEnd(0), freq="M")]
+    return [(s.strftime("%Y-%m-%d"), e.strftime("%Y-%m-%d"))
+            for s in starts for e in ends if s < e]
+
+
+# Layout of the tables (files of an older layout are emptied on open)
+SCHEMA_VERSION = 1
+
+
+class ResultStore:
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+
+        with self._connect() as con:
+            if con.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                for table in ("meta", "pvalues", "fits"):
+                    con.execute("DROP TABLE IF EXISTS %s" % table)
+                con.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS pvalues ("
+                " version TEXT, test TEXT, variable TEXT, start TEXT, end TEXT, maxlag INTEGER, pvalue REAL,"
+                " PRIMARY KEY (version, test, variable, start, end, maxlag))")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS fits ("
+                " version TEXT, variable TEXT, model TEXT, start TEXT, end TEXT, params TEXT, updated INTEGER,"
+                " PRIMARY KEY (version, variable, model, start, end))")
+
+    # One short-lived connection per operation so that threads and
+    # gunicorn workers can share the file
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    # Move to a new data version after rows were appended from `first_new_date`
+    # on: the windows ending before the new rows are carried over. Rows of the
+    # previous version stay for the workers that have not ingested yet
+    def rebase(self, version, first_new_date):
+        first_new_date = pd.Timestamp(first_new_date).strftime("%Y-%m-%d")
+        previous = self.version
+        with self._connect() as con:
+            con.execute("INSERT OR IGNORE INTO pvalues"
+                        " SELECT ?, test, variable, start, end, maxlag, pvalue FROM pvalues"
+                        " WHERE version = ? AND end < ?", (version, previous, first_new_date))
+            con.execute("INSERT OR IGNORE INTO fits"
+                        " SELECT ?, variable, model, start, end, params, updated FROM fits"
+                        " WHERE version = ? AND end < ?", (version, previous, first_new_date))
+            con.execute("DELETE FROM pvalues WHERE version NOT IN (?, ?)", (version, previous))
+            con.execute("DELETE FROM fits WHERE version NOT IN (?, ?)", (version, previous))
+        self.version = version
+
+    # Stored p-values for `variables`; missing ones are left out
+    def get_many(self, test, variables, start, end, maxlag):
+        variables = list(variables)
+        with self._connect() as con:
+            rows = con.execute(
+                "SELECT variable, pvalue FROM pvalues"
+                " WHERE version = ? AND test = ? AND start = ? AND end = ? AND maxlag = ?"
+                " AND variable IN (%s)" % ",".join("?" * len(variables)),
+                [self.version, test, start, end, maxlag] + variables).fetchall()
+        return {variable: (np.nan if pvalue is None else pvalue) for variable, pvalue in rows}
+
+    def get(self, test, variable, start, end, maxlag):
+        return self.get_many(test, [variable], start, end, maxlag).get(variable)
+
+    def put_many(self, test, pvalues, start, end, maxlag):
+        rows = [(self.version, test, variable, start, end, maxlag, None if np.isnan(p) else float(p))
+                for variable, p in pvalues.items()]
+        with self._connect() as con:
+            con.executemany("INSERT OR REPLACE INTO pvalues VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def put(self, test, variable, pvalue, start, end, maxlag):
+        self.put_many(test, {variable: pvalue}, start, end, maxlag)
+
+    # Fitted model parameters of the window (None if not fitted)
+    def get_fit(self, variable, model, start, end):
+        with self._connect() as con:
+            row = con.execute("SELECT params FROM fits"
+                              " WHERE version = ? AND variable = ? AND model = ? AND start = ? AND end = ?",
+                              (self.version, variable, model, start, end)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    # Parameters of the last window fitted for the variable and model on this version (None if none),
+    # to warm-start the next fit; right after an ingestion the fits of the previous version are used
+    def latest_fit(self, variable, model):
+        with self._connect() as con:
+            row = con.execute("SELECT params FROM fits WHERE variable = ? AND model = ?"
+                              " ORDER BY version = ? DESC, updated DESC LIMIT 1",
+                              (variable, model, self.version)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put_fit(self, variable, model, start, end, params):
+        with self._connect() as con:
+            updated = con.execute("SELECT COALESCE(MAX(updated), 0) + 1 FROM fits").fetchone()[0]
+            con.execute("INSERT OR REPLACE INTO fits VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (self.version, variable, model, start, end, json.dumps([float(p) for p in params]), updated))
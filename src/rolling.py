@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# Rolling-window statistics of a component against Close.
+#
+# The rolling correlation comes from running sums: every step adds the
+# newest observation and drops the oldest one (as differences of
+# cumulative sums), so the whole series costs O(n) instead of one corr()
+# per window. The cointegration test has no such update; its p-value is
+# evaluated on windows ending every `step` observations, the windows in
+# parallel (see parallel.py).
+
+import numpy as np
+
+import parallel
+
+
+# Sums of v over every window of `window` consecutive observations
+def _window_sums(v, window):
+    running = np.concatenate([[0.0], np.cumsum(v)])
+    return running[window:] - running[:-window]
+
+
+# Pearson correlation of x and y over the `window` observations ending at
+# each position (NaN for the first window - 1 positions and flat windows)
+def rolling_correlation(x, y, window):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if window < 2 or len(x) < window:
+        return out
+
+    # Sums around the first values, so that high price levels cost no precision
+    x = x - x[0]
+    y = y - y[0]
+    sx, sy = _window_sums(x, window), _window_sums(y, window)
+    sxx, syy, sxy = _window_sums(x * x, window), _window_sums(y * y, window), _window_sums(x * y, window)
+
+    vx = sxx - sx * sx / window
+    vy = syy - sy * sy / window
+    cov = sxy - sx * sy / window
+
+    # Variances lost in the rounding of the running sums count as flat
+    flat = (vx <= 1e-10 * np.abs(sxx)) | (vy <= 1e-10 * np.abs(syy))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.clip(cov / np.sqrt(vx * vy), -1.0, 1.0)
+    corr[flat] = np.nan
+
+    out[window - 1:] = corr
+    return out
+
+
+# Cointegration p-values of columns i and j of `values` over the windows of
+# `window` rows ending every `step` rows (the last row always included):
+# (positions of the window ends, p-values; NaN where the test fails)
+def rolling_cointegration(values, i, j, window, step=1, n_jobs=None):
+    if len(values) < window:
+        return np.array([], dtype=int), np.array([])
+
+    ends = np.arange(len(values), window - 1, -step)[::-1]
+    pairs = [((end - window, end), i, j) for end in ends]
+    pvalues = parallel.pairwise(parallel.coint_pvalue, values, pairs, n_jobs=n_jobs, return_exceptions=True)
+    return ends - 1, np.array([np.nan if isinstance(p, Exception) else p for p in pvalues], dtype=np.float64)
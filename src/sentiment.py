@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+# Daily sentiment panel for the /page-3 statistics.
+#
+# The tweets are reduced once to a dense dates x influencers matrix of the
+# mean daily sentiment, aligned by calendar date onto the BTC returns (see
+# align.py for the fill / lag policies) and kept in a Panel ("returns"
+# first, then one column per influencer). The statistics callbacks then
+# only slice one influencer / year out of it.
+
+import numpy as np
+import pandas as pd
+
+from align import align
+from panel import Panel
+
+
+# Mean sentiment per calendar day (dates x influencers, NaN on days without tweets)
+def daily_sentiment(tweets):
+    day = tweets["Datetime"]
+    if day.dt.tz is not None:
+        day = day.dt.tz_localize(None)
+    day = day.dt.normalize().rename("Date")
+
+    daily = tweets.groupby([day, tweets["Username"]])["sentiment"].mean().unstack("Username")
+    return daily.sort_index()
+
+
+# Daily sentiment min-max scaled per influencer over all of their tweets
+# (a zero range scales by 1, as sklearn's MinMaxScaler does)
+def minmax_daily_sentiment(tweets, daily):
+    bounds = tweets.groupby("Username")["sentiment"].agg(["min", "max"]).reindex(daily.columns)
+    span = (bounds["max"] - bounds["min"]).replace(0, 1.0)
+    return (daily - bounds["min"]) / span
+
+
+# Rows (dates, returns + sentiment values) of the panel for the given returns
+def sentiment_rows(daily, returns, fill="none", lag=0, tolerance=None):
+    matrix = align(daily, returns.index, fill=fill, lag=lag, tolerance=tolerance)
+    values = np.column_stack([returns.to_numpy(dtype=np.float64), matrix.to_numpy(dtype=np.float64)])
+    return returns.index, values
+
+
+# Panel of the returns and every influencer's daily sentiment on the returns dates
+def sentiment_panel(daily, returns, **alignment):
+    dates, values = sentiment_rows(daily, returns, **alignment)
+    return Panel(dates, values, ["returns"] + list(daily.columns))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+# Startup benchmark: import time and resident memory per dependency.
+#
+# Every measurement runs in a fresh interpreter, so a library is timed
+# with everything it pulls in. "app" is a full worker boot (data loading
+# included) and reports which of the deferred libraries it imported. Run
+# from src/:
+#
+#     python startup_benchmark.py [repeats]
+
+import json
+import subprocess
+import sys
+
+
+# Libraries imported at boot, then the ones deferred with lazy_import
+EAGER = ["numpy", "pandas", "plotly.express", "dash", "dash_daq", "dash_bootstrap_components", "PIL.Image"]
+DEFERRED = ["scipy.stats", "statsmodels.tsa.stattools", "statsmodels.tsa.seasonal", "plotly.figure_factory", "wordcloud", "matplotlib", "yfinance"]
+
+PROBE = """
+import json, sys, time
+
+def rss():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+before = rss()
+start = time.perf_counter()
+__import__(%r)
+seconds = time.perf_counter() - start
+json.dump(dict(seconds=seconds, rss=rss(), rss_delta=rss() - before,
+               deferred=[name for name in %r if name in sys.modules]), sys.stdout)
+"""
+
+
+def measure(module, repeats=3):
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", PROBE % (module, DEFERRED)],
+                                check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["seconds"])
+
+
+def main(repeats=3):
+    runs = {}
+    print("%-30s %10s %10s %10s" % ("module", "import s", "RSS MB", "+RSS MB"))
+    for group, modules in (("boot", EAGER), ("deferred", DEFERRED), ("worker", ["app"])):
+        print("-- %s" % group)
+        for module in modules:
+            try:
+                runs[module] = run = measure(module, repeats)
+            except subprocess.CalledProcessError:
+                print("%-30s %10s" % (module, "n/a"))
+                continue
+            print("%-30s %10.3f %10.1f %10.1f" % (module, run["seconds"], run["rss"], run["rss_delta"]))
+
+    if "app" in runs:
+        print("deferred libraries imported by the app at boot: %s" % (", ".join(runs["app"]["deferred"]) or "none"))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
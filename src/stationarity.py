@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+# Stationarity tests of every component.
+#
+# Each component is tested at levels and in first differences with the
+# augmented Dickey-Fuller test (H0: unit root, lag order chosen by AIC as
+# adfuller's default) and the KPSS test (H0: stationary around a constant).
+# The two nulls are opposite: a stationary series has a small ADF p-value
+# and a large KPSS one. Components are tested in parallel on a joblib
+# process pool (STATS_N_JOBS, see parallel.py); the app keeps the p-values
+# in the result store, so a data version is only tested once.
+
+import warnings
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+
+import parallel
+from lazy import lazy_import
+
+stattools = lazy_import("statsmodels.tsa.stattools")
+
+
+# Result store test names, in table order
+TESTS = ("adf_level", "kpss_level", "adf_diff", "kpss_diff")
+
+
+def adf_pvalue(x):
+    return stattools.adfuller(x)[1]
+
+
+# KPSS p-values are interpolated in a table and clipped to [0.01, 0.1]
+def kpss_pvalue(x):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return stattools.kpss(x, regression="c", nlags="auto")[1]
+
+
+# p-values of TESTS for one series (NaN where a test fails)
+def test(x):
+    x = np.asarray(x, dtype=np.float64)
+    x = x[np.isfinite(x)]
+    pvalues = []
+    for fn, series in [(adf_pvalue, x), (kpss_pvalue, x), (adf_pvalue, np.diff(x)), (kpss_pvalue, np.diff(x))]:
+        try:
+            pvalues.append(float(fn(series)))
+        except (ValueError, np.linalg.LinAlgError):
+            pvalues.append(np.nan)
+    return pvalues
+
+
+def _test_chunk(values, columns):
+    return [test(values[:, j]) for j in columns]
+
+
+# {test: {variable: p-value}} for the columns of `values` named `variables`
+def test_all(values, variables, n_jobs=None):
+    columns = list(range(values.shape[1]))
+    n_jobs = effective_n_jobs(parallel.N_JOBS if n_jobs is None else n_jobs)
+    if n_jobs == 1:
+        rows = _test_chunk(values, columns)
+    else:
+        chunks = [columns[k::n_jobs] for k in range(n_jobs)]
+        done = Parallel(n_jobs=n_jobs, max_nbytes=0, mmap_mode="r")(
+            delayed(_test_chunk)(values, chunk) for chunk in chunks)
+        rows = [None] * len(columns)
+        for k, chunk in enumerate(done):
+            rows[k::n_jobs] = chunk
+    return {name: {variable: row[t] for variable, row in zip(variables, rows)} for t, name in enumerate(TESTS)}
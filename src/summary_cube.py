@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# Summary statistics cube for the home page indicators.
+#
+# Holds count / sum / sum of squares / min / max for every
+# variable x year x month so that the descriptive indicators are
+# a constant time lookup instead of a scan of the melted table.
+# Sums are taken around a per-variable shift (the first observed
+# value) so the variance of large, nearly constant series such as
+# Difficulty does not suffer from cancellation.
+
+import numpy as np
+import pandas as pd
+
+
+class SummaryCube:
+
+    def __init__(self, variables, first_year, last_year):
+        self.variables = list(variables)
+        self.index = {name: i for i, name in enumerate(self.variables)}
+        self.first_year = first_year
+
+        shape = (len(self.variables), last_year - first_year + 1, 12)
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.sum = np.zeros(shape)
+        self.sumsq = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+        self.shift = np.full(len(self.variables), np.nan)
+
+    @classmethod
+    def from_frame(cls, df, date_col="Date"):
+        dates = pd.to_datetime(df[date_col])
+        variables = [col for col in df.columns if col != date_col]
+        cube = cls(variables, dates.dt.year.min(), dates.dt.year.max())
+        cube.append(dates, df[variables].to_numpy(dtype=float))
+        return cube
+
+    # Grow the year axis so that `year` fits
+    def _ensure_year(self, first_year, last_year):
+        before = max(self.first_year - first_year, 0)
+        after = max(last_year - (self.first_year + self.count.shape[1] - 1), 0)
+        if not before and not after:
+            return
+
+        pad = ((0, 0), (before, after), (0, 0))
+        self.count = np.pad(self.count, pad)
+        self.sum = np.pad(self.sum, pad)
+        self.sumsq = np.pad(self.sumsq, pad)
+        self.min = np.pad(self.min, pad, constant_values=np.inf)
+        self.max = np.pad(self.max, pad, constant_values=-np.inf)
+        self.first_year -= before
+
+    # Add new rows (dates x variables) to the aggregates
+    def append(self, dates, values):
+        dates = pd.DatetimeIndex(pd.to_datetime(dates))
+        values = np.asarray(values, dtype=float).reshape(len(dates), len(self.variables))
+        if not len(dates):
+            return
+
+        years = dates.year.to_numpy()
+        self._ensure_year(years.min(), years.max())
+        y = years - self.first_year
+        m = dates.month.to_numpy() - 1
+
+        # First observation of a variable fixes its shift
+        unset = np.isnan(self.shift)
+        if unset.any():
+            first = pd.DataFrame(values).bfill().to_numpy()[0]
+            self.shift[unset] = first[unset]
+
+        for v in range(len(self.variables)):
+            x = values[:, v]
+            ok = ~np.isnan(x)
+            if not ok.any():
+                continue
+            yy, mm, x = y[ok], m[ok], x[ok]
+            d = x - self.shift[v]
+            np.add.at(self.count[v], (yy, mm), 1)
+            np.add.at(self.sum[v], (yy, mm), d)
+            np.add.at(self.sumsq[v], (yy, mm), d * d)
+            np.minimum.at(self.min[v], (yy, mm), x)
+            np.maximum.at(self.max[v], (yy, mm), x)
+
+    def _cell(self, variable, year, month):
+        y = year - self.first_year
+        if variable not in self.index or not 0 <= y < self.count.shape[1] or not 1 <= month <= 12:
+            return None
+        return self.index[variable], y, month - 1
+
+    def count_of(self, variable, year, month):
+        cell = self._cell(variable, year, month)
+        return 0 if cell is None else int(self.count[cell])
+
+    def mean(self, variable, year, month):
+        n = self.count_of(variable, year, month)
+        if not n:
+            return np.nan
+        cell = self._cell(variable, year, month)
+        return self.shift[cell[0]] + self.sum[cell] / n
+
+    def minimum(self, variable, year, month):
+        if not self.count_of(variable, year, month):
+            return np.nan
+        return self.min[self._cell(variable, year, month)]
+
+    def maximum(self, variable, year, month):
+        if not self.count_of(variable, year, month):
+            return np.nan
+        return self.max[self._cell(variable, year, month)]
+
+    # Sample standard deviation (ddof=1), as pandas' Series.std
+    def std(self, variable, year, month):
+        n = self.count_of(variable, year, month)
+        if n < 2:
+            return np.nan
+        cell = self._cell(variable, year, month)
+        s = self.sum[cell]
+        var = (self.sumsq[cell] - s * s / n) / (n - 1)
+        return np.sqrt(max(var, 0.0))
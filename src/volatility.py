@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# Conditional volatility models (GARCH family, fitted with arch).
+#
+# A model is fitted by maximum likelihood on the percentage returns of a
+# component over a window of days. The fitted parameters are kept in the
+# result store per (variable, model, window): charting a window fitted
+# before only filters the returns through the stored parameters, which
+# costs one pass over the data instead of an optimisation.
+#
+# A window not fitted yet (a new window, or the same window shifted by
+# appended days) starts the optimiser from the last parameters fitted for
+# the variable and model: they are already close to the optimum, so the
+# fit takes a few iterations instead of a cold start from arch's defaults.
+
+import numpy as np
+import pandas as pd
+
+from lazy import lazy_import
+
+arch = lazy_import("arch")
+
+
+# Model name: arch_model specification, forecast method (EGARCH has no analytic multi-step forecast)
+MODELS = {
+    "GARCH": (dict(vol="GARCH", p=1, o=0, q=1), "analytic"),
+    "GJR-GARCH": (dict(vol="GARCH", p=1, o=1, q=1), "analytic"),
+    "EGARCH": (dict(vol="EGARCH", p=1, o=1, q=1), "simulation"),
+}
+
+
+# Percentage returns the models are fitted on: returns as they are, log returns and
+# every other component from its daily % changes (`changes`, see derived.py)
+def percentage_returns(series, changes):
+    if series.name == "returns":
+        returns = series
+    elif series.name == "log_returns":
+        returns = 100 * series
+    else:
+        returns = changes
+    return returns[np.isfinite(returns)]
+
+
+def model(returns, name):
+    spec, _ = MODELS[name]
+    return arch.arch_model(returns, mean="Constant", dist="normal", rescale=False, **spec)
+
+
+# Maximum likelihood parameters, starting from `starting_values` when given (falls
+# back to a cold start when the warm start is rejected or does not converge)
+def fit(returns, name, starting_values=None):
+    am = model(returns, name)
+    if starting_values is not None:
+        try:
+            res = am.fit(starting_values=np.asarray(starting_values, dtype=np.float64),
+                         disp="off", show_warning=False)
+            if res.convergence_flag == 0:
+                return res.params.values
+        except ValueError:
+            pass
+    return am.fit(disp="off", show_warning=False).params.values
+
+
+# Parameters of the model on these returns: stored ones when the window was fitted
+# before, otherwise fitted (warm-started from the last fit of the variable) and stored
+def fitted_params(store, variable, name, returns):
+    start, end = (d.strftime("%Y-%m-%d") for d in returns.index[[0, -1]])
+    params = store.get_fit(variable, name, start, end)
+    if params is None:
+        params = fit(returns, name, store.latest_fit(variable, name))
+        store.put_fit(variable, name, start, end, params)
+    return np.asarray(params, dtype=np.float64)
+
+
+# (fitted conditional volatility, forecast volatility over the next `horizon` days), in %
+def conditional_volatility(returns, name, params, horizon=30):
+    _, method = MODELS[name]
+    fixed = model(returns, name).fix(params)
+
+    forecast = fixed.forecast(horizon=horizon, method=method, reindex=False,
+                              random_state=np.random.RandomState(0))
+    dates = pd.date_range(returns.index[-1] + pd.Timedelta(days=1), periods=horizon, freq="D")
+    return (pd.Series(fixed.conditional_volatility, index=returns.index),
+            pd.Series(np.sqrt(forecast.variance.values[-1]), index=dates))
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+# Word cloud term frequencies and rendered image cache.
+#
+# The tweets are tokenised once into term frequency tables per
+# (Username, year), the same way WordCloud.generate does it, and a
+# selection of several years is the sum of its tables. Images are drawn
+# with WordCloud.generate_from_frequencies and kept as PNG files on disk,
+# keyed by the frequencies and the style, with least recently used
+# eviction; the PNGs are sent to the browser as they are (see images.py).
+
+import hashlib
+import io
+import json
+import os
+from collections import Counter
+
+from PIL import Image
+
+from lazy import lazy_import
+
+wordcloud = lazy_import("wordcloud")
+
+
+# Style of the /page-3 word cloud (WordCloud's default 400 x 200 canvas)
+STYLE = dict(background_color="white", width=400, height=200)
+
+
+# Term frequencies per (Username, year)
+def term_frequencies(tweets):
+    processor = wordcloud.WordCloud()
+    return {
+        (user, year): processor.process_text(" ".join(texts.astype(str)))
+        for (user, year), texts in tweets.groupby(["Username", "year"])["Text"]
+    }
+
+
+# Summed frequencies of the influencer over the selected year(s)
+def merge_frequencies(tables, user, years):
+    if not isinstance(years, (list, tuple, set)):
+        years = [years]
+    merged = Counter()
+    for year in years:
+        merged.update(tables.get((user, year), {}))
+    return dict(merged)
+
+
+class ImageCache:
+
+    def __init__(self, path, max_items=256):
+        self.path = path
+        self.max_items = max_items
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".png")
+
+    # Encoded PNG of `key` (None when missing); a hit refreshes its recency
+    def get_png(self, key):
+        try:
+            with open(self._file(key), "rb") as f:
+                png = f.read()
+        except OSError:
+            return None
+        os.utime(self._file(key))
+        return png
+
+    def put(self, key, image):
+        buffer = io.BytesIO()
+        Image.fromarray(image).save(buffer, format="PNG", optimize=True)
+
+        # Write then rename, so a concurrent reader never sees a partial file
+        tmp = "%s.tmp-%d" % (self._file(key), os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp, self._file(key))
+        self._evict()
+        return buffer.getvalue()
+
+    # Drop the least recently used images beyond max_items
+    def _evict(self):
+        files = [os.path.join(self.path, name) for name in os.listdir(self.path) if name.endswith(".png")]
+        if len(files) <= self.max_items:
+            return
+        files.sort(key=lambda name: os.path.getmtime(name) if os.path.exists(name) else 0)
+        for name in files[:len(files) - self.max_items]:
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+
+
+def image_key(frequencies, style):
+    payload = json.dumps([sorted(style.items()), sorted(frequencies.items())], default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# (key, PNG) of the word cloud of `frequencies`, drawn and encoded once per (frequencies, style)
+def render_png(frequencies, cache, **style):
+    style = dict(STYLE, **style)
+    key = image_key(frequencies, style)
+
+    png = cache.get_png(key)
+    if png is None:
+        image = wordcloud.WordCloud(**style).generate_from_frequencies(frequencies).to_array()
+        png = cache.put(key, image)
+    return key, png
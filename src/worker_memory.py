@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# Per-worker memory of the gunicorn deployment, with and without preload.
+#
+# Starts gunicorn with gunicorn.conf.py (GUNICORN_PRELOAD=1, then 0), sends
+# every page a few callback requests and reports the RSS, PSS and USS
+# (unique set size: the pages only that process holds) of the master and
+# each worker from /proc/<pid>/smaps_rollup (Linux only). Run from src/:
+#
+#     python worker_memory.py [workers]
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+CONFIG = os.path.join(ROOT, "gunicorn.conf.py")
+
+# Callbacks sent to every worker (output ids, (input id, value) or (input id, property, value) ...)
+REQUESTS = [
+    (["mean_indicator_plot", "min_indicator_plot", "max_indicator_plot", "std_indicator_plot",
+      "distribution_hist_plot", "distribution_bp_plot_y", "distribution_bp_plot_m"],
+     [("btc-components-dropdown", "Close"), ("my-LED-display-slider-1", 8), ("my-LED-display-slider-2", 2021)]),
+    (["ad_fuller_plot"], [("btc-components-dropdown", "Close")]),
+    (["pacf_acf_plot"], [("btc-components-dropdown", "Close")]),
+    (["seasonal_plots"], [("btc-components-dropdown", "Close"), ("seasonal-mode-radio", "classical")]),
+    (["standardised_trend_plot"], [("btc-components-dropdown", "Close"), ("standardised_trend_plot", "relayoutData", None)]),
+    (["sentiment_trend_plot"], [("tweets-dropdown", "saylor"), ("sentiment_trend_plot", "relayoutData", None)]),
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# kB figures of /proc/<pid>/smaps_rollup
+def memory(pid):
+    fields = {}
+    with open("/proc/%d/smaps_rollup" % pid) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return dict(rss=fields["Rss"], pss=fields["Pss"],
+                uss=fields["Private_Clean"] + fields["Private_Dirty"])
+
+
+def children(pid):
+    with open("/proc/%d/task/%d/children" % (pid, pid)) as f:
+        return [int(child) for child in f.read().split()]
+
+
+def post(url, outputs, inputs):
+    body = {
+        "output": ".." + "...".join("%s.figure" % output for output in outputs) + ".."
+                  if len(outputs) > 1 else "%s.figure" % outputs[0],
+        "outputs": [{"id": output, "property": "figure"} for output in outputs]
+                   if len(outputs) > 1 else {"id": outputs[0], "property": "figure"},
+        "inputs": [{"id": input[0], "property": "value" if len(input) == 2 else input[1], "value": input[-1]}
+                   for input in inputs],
+        "changedPropIds": [],
+    }
+    request = urllib.request.Request(url + "/_dash-update-component", data=json.dumps(body).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=300) as response:
+        response.read()
+
+
+def measure(preload, workers, boot_timeout=300):
+    port = free_port()
+    url = "http://127.0.0.1:%d" % port
+    env = dict(os.environ, GUNICORN_PRELOAD="1" if preload else "0", WEB_CONCURRENCY=str(workers),
+               GUNICORN_THREADS="1")
+    master = subprocess.Popen([sys.executable, "-m", "gunicorn", "--config", CONFIG, "--bind", "127.0.0.1:%d" % port],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # Wait for the workers to answer
+        start = time.time()
+        while True:
+            try:
+                urllib.request.urlopen(url + "/", timeout=5).read()
+                if len(children(master.pid)) == workers:
+                    break
+            except OSError:
+                pass
+            if time.time() - start > boot_timeout or master.poll() is not None:
+                raise RuntimeError("gunicorn did not start")
+            time.sleep(0.5)
+        boot = time.time() - start
+
+        # One thread per worker: each round of requests spreads over the workers
+        for _ in range(workers):
+            for outputs, inputs in REQUESTS:
+                post(url, outputs, inputs)
+
+        return boot, memory(master.pid), [memory(pid) for pid in children(master.pid)]
+    finally:
+        master.terminate()
+        master.wait()
+
+
+def main(workers=2):
+    print("%-10s %-8s %10s %10s %10s" % ("mode", "process", "RSS MB", "PSS MB", "USS MB"))
+    for preload in (False, True):
+        mode = "preload" if preload else "per-worker"
+        boot, master, worker_memory = measure(preload, workers)
+        for name, mem in [("master", master)] + [("worker %d" % i, m) for i, m in enumerate(worker_memory, 1)]:
+            print("%-10s %-8s %10.1f %10.1f %10.1f" % (mode, name, mem["rss"] / 1024, mem["pss"] / 1024, mem["uss"] / 1024))
+        total = sum(m["pss"] for m in [master] + worker_memory) / 1024
+        print("%-10s total PSS %.1f MB, mean worker USS %.1f MB, ready in %.1f s" % (
+            mode, total, sum(m["uss"] for m in worker_memory) / 1024 / len(worker_memory), boot))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# Alignment of the daily sentiment onto the returns dates (align.py via
+# sentiment.py): every (date, value) pair of the joined panel, for each fill
+# policy and for a lag, on a window with no tweets on its first and last days.
+#
+#     python -m pytest tests
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+import sentiment
+from align import align
+
+
+# Returns on 2022-01-01 .. 2022-01-07
+RETURNS = pd.Series([1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+                    index=pd.date_range("2022-01-01", "2022-01-07", freq="D", name="Date"), name="returns")
+
+# Tweets on the 2nd (two, mean 0.3), 4th and 5th only: no sentiment on the 1st, 3rd, 6th and 7th
+TWEETS = pd.DataFrame({
+    "Username": ["saylor", "saylor", "saylor", "saylor", "elonmusk"],
+    "Datetime": pd.to_datetime(["2022-01-02 08:15", "2022-01-02 23:59", "2022-01-04 12:00",
+                                "2022-01-05 00:01", "2022-01-03 09:00"]),
+    "sentiment": [0.2, 0.4, -0.5, 0.1, 0.9],
+})
+
+DAYS = ["2022-01-01", "2022-01-02", "2022-01-03", "2022-01-04", "2022-01-05", "2022-01-06", "2022-01-07"]
+nan = np.nan
+
+
+# (date, value) pairs of one influencer in the joined panel
+def joined(influencer="saylor", **alignment):
+    dates, values = sentiment.sentiment_rows(sentiment.daily_sentiment(TWEETS), RETURNS, **alignment)
+    columns = ["returns"] + list(sentiment.daily_sentiment(TWEETS).columns)
+    assert list(dates) == list(RETURNS.index)
+    np.testing.assert_array_equal(values[:, 0], RETURNS.values)
+    return list(zip(dates.strftime("%Y-%m-%d"), values[:, columns.index(influencer)]))
+
+
+def assert_pairs(pairs, expected):
+    assert [date for date, _ in pairs] == DAYS
+    np.testing.assert_allclose([value for _, value in pairs], expected, equal_nan=True, atol=1e-12)
+
+
+def test_daily_sentiment_is_the_mean_per_calendar_day():
+    daily = sentiment.daily_sentiment(TWEETS)["saylor"].dropna()
+    assert list(daily.index.strftime("%Y-%m-%d")) == ["2022-01-02", "2022-01-04", "2022-01-05"]
+    np.testing.assert_allclose(daily.values, [0.3, -0.5, 0.1])
+
+
+@pytest.mark.parametrize("fill, alignment, expected", [
+    ("none", {}, [nan, 0.3, nan, -0.5, 0.1, nan, nan]),
+    ("zero", {}, [0.0, 0.3, 0.0, -0.5, 0.1, 0.0, 0.0]),
+    ("ffill", {}, [nan, 0.3, 0.3, -0.5, 0.1, 0.1, 0.1]),
+    ("ffill", dict(tolerance=1), [nan, 0.3, 0.3, -0.5, 0.1, 0.1, nan]),
+    ("interpolate", {}, [nan, 0.3, -0.1, -0.5, 0.1, nan, nan]),
+    ("interpolate", dict(tolerance=1), [nan, 0.3, nan, -0.5, 0.1, nan, nan]),
+])
+def test_fill_policies(fill, alignment, expected):
+    assert_pairs(joined(fill=fill, **alignment), expected)
+
+
+# Date t is paired with the sentiment of t - lag
+@pytest.mark.parametrize("fill, expected", [
+    ("none", [nan, nan, 0.3, nan, -0.5, 0.1, nan]),
+    ("zero", [0.0, 0.0, 0.3, 0.0, -0.5, 0.1, 0.0]),
+    ("ffill", [nan, nan, 0.3, 0.3, -0.5, 0.1, 0.1]),
+    ("interpolate", [nan, nan, 0.3, -0.1, -0.5, 0.1, nan]),
+])
+def test_lag(fill, expected):
+    assert_pairs(joined(fill=fill, lag=1), expected)
+
+
+def test_other_influencer_lands_on_its_own_day():
+    assert_pairs(joined("elonmusk"), [nan, nan, 0.9, nan, nan, nan, nan])
+
+
+# Aligning a tail of new dates gives the values of the whole window
+@pytest.mark.parametrize("fill", ["none", "zero", "ffill", "interpolate"])
+def test_tail_matches_whole_window(fill):
+    daily = sentiment.daily_sentiment(TWEETS)
+    whole = align(daily, RETURNS.index, fill=fill, lag=1)
+    tail = align(daily, RETURNS.index[4:], fill=fill, lag=1)
+    pd.testing.assert_frame_equal(tail, whole.iloc[4:])
+
+
+def test_unknown_fill_policy():
+    with pytest.raises(ValueError):
+        align(sentiment.daily_sentiment(TWEETS), RETURNS.index, fill="nearest")
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# Batched Granger causality engine (granger.py) against statsmodels'
+# grangercausalitytests: the same ssr-chi2 p-values for every column of a
+# slice of btc_components.csv caused by Close (as the causality table),
+# NaN where statsmodels refuses the test (constant column, perfect fit) and
+# the same error when there are too few observations for the lags.
+#
+#     python -m pytest tests
+
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.tools.sm_exceptions import InfeasibleTestError
+from statsmodels.tsa.stattools import grangercausalitytests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from data_cache import clean_components
+from granger import granger_min_pvalues, granger_pvalues
+
+
+COMPONENTS = clean_components(pd.read_csv(os.path.join(os.path.dirname(__file__), os.pardir, "src",
+                                                       "btc_components.csv")))
+COMPONENTS = COMPONENTS.set_index(pd.to_datetime(COMPONENTS.pop("Date")))
+
+MAXLAG = 4
+
+
+# statsmodels' ssr-chi2 p-values of lags 1..maxlag for "cause Granger-causes target" (NaN when refused)
+def reference(target, cause, maxlag=MAXLAG):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            tests = grangercausalitytests(np.column_stack([target, cause]), maxlag, verbose=False)
+        except InfeasibleTestError:
+            return [np.nan] * maxlag
+    return [tests[lag][0]["ssr_chi2test"][1] for lag in range(1, maxlag + 1)]
+
+
+def test_every_column_matches_statsmodels():
+    window = COMPONENTS["2021-03-01":"2022-07-31"]
+    cause = window["Close"].values
+
+    pvalues = granger_pvalues(window.values, cause, MAXLAG)
+    expected = np.array([reference(window[column].values, cause) for column in window.columns])
+
+    # Close on itself: the joint design is rank deficient, which the rank cut-off handles as lstsq does
+    assert "Close" in window.columns
+    np.testing.assert_allclose(pvalues, expected, rtol=0, atol=1e-10, equal_nan=True)
+
+
+def test_constant_and_perfectly_fitted_targets_are_nan():
+    window = COMPONENTS["2022-01-01":"2022-03-31"]
+    cause = window["Close"].values
+    targets = np.column_stack([np.full(len(window), 7.0),                 # constant target
+                               np.roll(cause, 1) * 2.0 + 1.0,             # cause lagged once, exactly
+                               window["Volume"].values])
+
+    pvalues = granger_pvalues(targets, cause, MAXLAG)
+    expected = np.array([reference(targets[:, j], cause) for j in range(targets.shape[1])])
+
+    assert np.isnan(pvalues[0]).all()
+    assert np.isfinite(pvalues[2]).all()
+    np.testing.assert_allclose(pvalues, expected, rtol=0, atol=1e-10, equal_nan=True)
+
+
+@pytest.mark.parametrize("rows", [3 * MAXLAG + 1, 5])
+def test_too_few_observations(rows):
+    window = COMPONENTS.iloc[:rows]
+    with pytest.raises(ValueError, match="Insufficient observations"):
+        granger_pvalues(window[["Volume"]].values, window["Close"].values, MAXLAG)
+    with pytest.raises(ValueError, match="Insufficient observations"):
+        reference(window["Volume"].values, window["Close"].values)
+
+
+def test_first_feasible_length_matches_statsmodels():
+    window = COMPONENTS.iloc[:3 * MAXLAG + 2]
+    cause = window["Close"].values
+    np.testing.assert_allclose(granger_pvalues(window[["Volume"]].values, cause, MAXLAG)[0],
+                               reference(window["Volume"].values, cause), rtol=0, atol=1e-10)
+
+
+def test_min_pvalue_is_the_minimum_of_the_rounded_lags():
+    window = COMPONENTS["2021-03-01":"2022-07-31"]
+    expected = np.round(np.array([reference(window[column].values, window["Close"].values)
+                                  for column in ("Volume", "Difficulty")]), 4).min(axis=1)
+    np.testing.assert_array_equal(
+        granger_min_pvalues(window[["Volume", "Difficulty"]].values, window["Close"].values, MAXLAG), expected)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+# Incremental ingestion (ingest.py): the last rows of btc_components.csv
+# ingested through a FrameSource on top of a load of the rows before them
+# give the same panel, derived series and summary cube as a full load, and
+# a data version that does not depend on how the rows were split.
+#
+#     python -m pytest tests
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from data_cache import clean_components
+from derived import TRANSFORMS, DerivedSeries
+from ingest import FrameSource, Ingestor, chain_hash, clean_tail
+from panel import Panel
+from result_store import data_hash
+from summary_cube import SummaryCube
+
+
+RAW = pd.read_csv(os.path.join(os.path.dirname(__file__), os.pardir, "src", "btc_components.csv"))
+
+# Rows left to the ingestion
+TAIL = 30
+
+
+# Panel, derived series and summary cube of a cleaned DF, as the app builds them
+def load(frame):
+    panel = Panel.from_frame(frame)
+    return panel, DerivedSeries(panel), SummaryCube.from_frame(frame)
+
+
+# Structures loaded from all but the last `tail` raw rows, then fed the raw
+# rows in `chunks` ingestions through a FrameSource (the app's append path)
+def ingested(tail=TAIL, chunks=1):
+    base = clean_components(RAW.iloc[:-tail]).reset_index(drop=True)
+    panel, derived, cube = load(base)
+    ingestor = Ingestor(base.iloc[-1], data_hash(base))
+
+    @ingestor.subscribe
+    def append(rows, version):
+        dates = pd.to_datetime(rows["Date"])
+        values = rows[panel.variables].to_numpy(dtype=np.float64)
+        panel.append(dates, values)
+        derived.append(dates, values)
+        cube.append(dates, values)
+
+    added = sum(ingestor.ingest(FrameSource(rows)) for rows in np.array_split(RAW.iloc[-tail:], chunks))
+    assert added == tail
+    return ingestor, panel, derived, cube
+
+
+@pytest.fixture(scope="module")
+def full():
+    return load(clean_components(RAW).reset_index(drop=True))
+
+
+def test_panel_matches_a_full_load(full):
+    _, panel, _, _ = ingested()
+    np.testing.assert_array_equal(panel.dates, full[0].dates)
+    np.testing.assert_array_equal(panel.values, full[0].values)
+    assert panel.variables == full[0].variables
+
+
+@pytest.mark.parametrize("transform", TRANSFORMS)
+def test_derived_series_match_a_full_load(full, transform):
+    _, _, derived, _ = ingested()
+    np.testing.assert_array_equal(derived[transform].dates, full[1][transform].dates)
+    np.testing.assert_allclose(derived[transform].values, full[1][transform].values,
+                               rtol=1e-9, atol=1e-12, equal_nan=True)
+
+
+def test_summary_cube_matches_a_full_load(full):
+    _, _, _, cube = ingested()
+    expected = full[2]
+    assert (cube.first_year, cube.count.shape) == (expected.first_year, expected.count.shape)
+    np.testing.assert_array_equal(cube.count, expected.count)
+    np.testing.assert_array_equal(cube.min, expected.min)
+    np.testing.assert_array_equal(cube.max, expected.max)
+
+    last = pd.Timestamp(RAW["Date"].iloc[-1])
+    for variable in ("Close", "Difficulty", "returns"):
+        for method in ("mean", "std"):
+            np.testing.assert_allclose(getattr(cube, method)(variable, last.year, last.month),
+                                       getattr(expected, method)(variable, last.year, last.month), rtol=1e-9)
+
+
+def test_version_does_not_depend_on_the_split():
+    versions = {chunks: ingested(chunks=chunks)[0].version for chunks in (1, 3, TAIL)}
+    assert len(set(versions.values())) == 1
+
+    base = clean_components(RAW.iloc[:-TAIL]).reset_index(drop=True)
+    assert versions[1] != data_hash(base)
+
+
+def test_nothing_new_leaves_the_version():
+    ingestor, panel, _, _ = ingested()
+    version, rows = ingestor.version, len(panel)
+
+    # Rows already ingested, then an empty source
+    assert ingestor.ingest(FrameSource(RAW)) == 0
+    assert ingestor.ingest(FrameSource(RAW.iloc[:0])) == 0
+    assert (ingestor.version, len(panel)) == (version, rows)
+
+
+def test_clean_tail_seeds_the_returns_with_the_last_clean_row():
+    full_clean = clean_components(RAW).reset_index(drop=True)
+    last_row = full_clean.iloc[-TAIL - 1]
+
+    tail = clean_tail(last_row, RAW.iloc[-TAIL:])
+    assert list(tail.columns) == list(full_clean.columns)
+    assert list(tail["Date"]) == list(full_clean["Date"].iloc[-TAIL:])
+    np.testing.assert_allclose(tail[["returns", "log_returns"]].to_numpy(dtype=np.float64),
+                               full_clean[["returns", "log_returns"]].iloc[-TAIL:].to_numpy(dtype=np.float64))
+
+    # The version is folded row by row
+    assert chain_hash(chain_hash("v", tail.iloc[:10]), tail.iloc[10:]) == chain_hash("v", tail)